@@ -0,0 +1,260 @@
+# admission.py
+"""Ограничение одновременных расчётов и ступенчатая деградация под нагрузкой.
+
+Одновременно выполняется не больше MAX_CONCURRENT расчётов с отрисовкой
+(отрисовка загружает процессор, и при перегрузке медленными становятся все
+запросы); расчёты только траектории ограничены отдельно (TRAJECTORY_SLOTS). У каждого запроса есть бюджет времени LATENCY_BUDGET; если
+запрошенный профиль в него не укладывается, запрос получает по очереди:
+
+    1. готовый результат тех же параметров из кэша (любого профиля);
+    2. предпросмотр с низким dpi ('preview');
+    3. только траекторию без изображений ('trajectory');
+    4. Overloaded — обработчик отвечает 503 с Retry-After.
+
+Остальные обработчики с расчётом или отрисовкой (/continue, /draw_graphics,
+/sensitivity, /bulk, /export, решатель в /preview, пересчёт /?run=1) занимают
+место через Admission.slot: те же места и та же очередь, но без ступеней —
+если место не освободилось за бюджет, Overloaded.
+
+Время каждого профиля оценивается скользящим средним по выполненным
+расчётам. К уже идущему расчёту тех же параметров запрос присоединяется
+без занятия места (см. web_core.run_simulation_shared).
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import memory
+from web_core import run_simulation_shared, simulation_in_flight, simulation_key
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUDGET = float(os.environ.get('LATENCY_BUDGET', 10.0))
+MAX_CONCURRENT = int(os.environ.get('MAX_CONCURRENT', os.cpu_count() or 2))
+# Отдельные места для расчётов траектории без изображений: они дешёвые
+# и не должны ждать, пока освободятся места отрисовки
+TRAJECTORY_SLOTS = int(os.environ.get('TRAJECTORY_SLOTS', 2 * MAX_CONCURRENT))
+# Сколько запросов может ждать места отрисовки; остальным достаётся
+# траектория, если для неё есть место, иначе 503
+MAX_WAITING = int(os.environ.get('MAX_WAITING', 4 * MAX_CONCURRENT))
+RETRY_AFTER = int(os.environ.get('RETRY_AFTER', 5))
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 16))
+
+# Ступени деградации, от лучшей к худшей
+LADDER = ['full', 'preview', 'trajectory']
+
+# Начальные оценки времени профилей, с (до первых измерений)
+INITIAL_ESTIMATES = {'full': 1.5, 'preview': 0.7, 'trajectory': 0.05}
+EWMA_WEIGHT = 0.2
+
+
+def is_degraded(requested, given):
+    """Выдан ли профиль хуже запрошенного"""
+    return LADDER.index(given) > LADDER.index(requested)
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after=RETRY_AFTER):
+        super().__init__("Сервер перегружен, повторите запрос позже")
+        self.retry_after = retry_after
+
+
+class Admission:
+    def __init__(self, slots=MAX_CONCURRENT, trajectory_slots=TRAJECTORY_SLOTS,
+                 max_waiting=MAX_WAITING, cache_size=RESULT_CACHE_SIZE):
+        self._slots = threading.BoundedSemaphore(slots)
+        self._trajectory_slots = threading.BoundedSemaphore(trajectory_slots)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+        self.slots = slots
+        self.trajectory_slots = trajectory_slots
+        self.max_waiting = max_waiting
+        self.estimates = dict(INITIAL_ESTIMATES)
+        self.decisions = {'full': 0, 'preview': 0, 'trajectory': 0, 'cached': 0,
+                          'shared': 0, 'rejected': 0, 'solver_fallback': 0}
+
+    # Кэш результатов: ключ параметров без профиля -> {профиль: outputs}
+
+    def _cache_get(self, base_key, profiles):
+        with self._lock:
+            entry = self._cache.get(base_key)
+            if entry is None:
+                return None
+            self._cache.move_to_end(base_key)
+            for profile in profiles:
+                if profile in entry:
+                    return entry[profile]
+        return None
+
+    def _cache_put(self, base_key, profile, outputs):
+        # Результат запасного решателя получен из-за нехватки времени —
+        # в кэш он не попадает, следующий запрос посчитает заново
+        if outputs.get('solver', {}).get('fallback'):
+            return
+        with self._lock:
+            self._cache.setdefault(base_key, {})[profile] = outputs
+            self._cache.move_to_end(base_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _record(self, profile, seconds, outputs):
+        with self._lock:
+            self.estimates[profile] += EWMA_WEIGHT * (seconds - self.estimates[profile])
+            if outputs.get('solver', {}).get('fallback'):
+                self.decisions['solver_fallback'] += 1
+
+    def _decide(self, decision, requested, reason):
+        with self._lock:
+            self.decisions[decision] += 1
+        if decision != requested:
+            logger.warning("Запрос %s: выдано '%s' (%s)", requested, decision, reason)
+
+    def _compute(self, step, slots, base_key, profile, reason, args, options):
+        """Расчёт step на уже занятом месте из slots; место освобождается"""
+        try:
+            with self._lock:
+                self._running += 1
+            started = time.monotonic()
+            outputs, shared = run_simulation_shared(*args, profile=step, **options)
+            self._record(step, time.monotonic() - started, outputs)
+        finally:
+            with self._lock:
+                self._running -= 1
+            slots.release()
+        self._cache_put(base_key, step, outputs)
+        self._decide(step, profile, reason)
+        return outputs, 'shared' if shared else step
+
+    def run(self, args, profile='full', budget=None, **options):
+        """run_simulation с учётом нагрузки; возвращает (outputs, решение).
+
+        решение — выданный профиль, 'cached' или 'shared'. Если не удалось
+        выдать даже траекторию, вызывается Overloaded.
+        """
+        budget = LATENCY_BUDGET if budget is None else budget
+        deadline = time.monotonic() + budget
+        if profile not in LADDER:
+            raise ValueError(f"Неизвестный профиль отрисовки: {profile}")
+        base_key = simulation_key(*args, **options)
+        ladder = LADDER[LADDER.index(profile):]
+
+        outputs = self._cache_get(base_key, [profile])
+        if outputs is not None:
+            self._decide('cached', 'cached', "повтор")
+            return outputs, 'cached'
+
+        with self._lock:
+            queue_full = self._waiting >= self.max_waiting
+            if not queue_full:
+                self._waiting += 1
+        if queue_full:
+            reason = "очередь заполнена"
+            outputs = self._cache_get(base_key, ladder)
+            if outputs is not None:
+                self._decide('cached', profile, reason)
+                return outputs, 'cached'
+            # Траектория не занимает мест отрисовки и в очередь не встаёт
+            if self._trajectory_slots.acquire(blocking=False):
+                return self._compute('trajectory', self._trajectory_slots, base_key, profile,
+                                     reason, args, options)
+            self._decide('rejected', profile, reason)
+            raise Overloaded()
+
+        waiting = True
+        try:
+            reason = "бюджет времени"
+            for step in ladder:
+                # К идущему расчёту тех же параметров присоединяемся без места
+                if simulation_in_flight(*args, profile=step, **options):
+                    outputs, shared = run_simulation_shared(*args, profile=step, **options)
+                    self._cache_put(base_key, step, outputs)
+                    self._decide('shared' if step == profile else step, profile, reason)
+                    return outputs, 'shared' if shared else step
+
+                slots = self._trajectory_slots if step == 'trajectory' else self._slots
+                spare = deadline - time.monotonic() - self.estimates[step]
+                if spare < 0 and step != ladder[-1]:
+                    continue
+                acquired = slots.acquire(blocking=False)
+                if not acquired:
+                    reason = "нет свободных мест"
+                    # Под нагрузкой сначала готовый результат, затем ожидание места
+                    # в пределах бюджета, затем более дешёвый профиль
+                    outputs = self._cache_get(base_key, ladder)
+                    if outputs is not None:
+                        self._decide('cached', profile, reason)
+                        return outputs, 'cached'
+                    acquired = slots.acquire(timeout=max(0.0, spare))
+                if not acquired:
+                    continue
+                with self._lock:
+                    self._waiting -= 1
+                waiting = False
+                return self._compute(step, slots, base_key, profile, reason, args, options)
+
+            self._decide('rejected', profile, reason)
+            raise Overloaded()
+        finally:
+            if waiting:
+                with self._lock:
+                    self._waiting -= 1
+
+    @contextmanager
+    def slot(self, kind='render', budget=None):
+        """Место для расчёта вне run: 'render' — с отрисовкой, 'trajectory' — без.
+
+        Ждёт места не дольше бюджета; если очередь заполнена или место
+        не освободилось, вызывается Overloaded.
+        """
+        budget = LATENCY_BUDGET if budget is None else budget
+        slots = self._slots if kind == 'render' else self._trajectory_slots
+        with self._lock:
+            queue_full = self._waiting >= self.max_waiting
+            if not queue_full:
+                self._waiting += 1
+        acquired = False
+        if not queue_full:
+            try:
+                acquired = slots.acquire(timeout=budget)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        if not acquired:
+            self._decide('rejected', kind, "очередь заполнена" if queue_full else "нет свободных мест")
+            raise Overloaded()
+        with self._lock:
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running -= 1
+            slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'trajectory_slots': self.trajectory_slots,
+                'running': self._running,
+                'waiting': self._waiting,
+                'max_waiting': self.max_waiting,
+                'budget': LATENCY_BUDGET,
+                'estimates': {k: round(v, 3) for k, v in self.estimates.items()},
+                'decisions': dict(self.decisions),
+                'cached_results': len(self._cache),
+            }
+
+
+admission = Admission()
+memory.register_cache('admission_results', lambda: len(admission._cache), admission.clear_cache)
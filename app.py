@@ -1,14 +1,127 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, render_template, request, redirect, url_for, jsonify, make_response, Response, stream_with_context
 import numpy as np
 import os
-from web_core import run_simulation, build_default_inputs, get_u_variable_for_equation, U_LABELS, parse_form
-from utils import clear_graphics  # Импорт из utils, а не из process
+import base64
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from web_core import build_default_inputs, get_u_variable_for_equation, U_LABELS, parse_form, get_default_outputs
+from utils import clear_graphics, save_image_files  # Импорт из utils, а не из process
+from static_assets import init_assets, image_url
+import image_formats
+import memory
+from admission import admission, Overloaded, is_degraded
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 
 os.makedirs('static/images', exist_ok=True)
+init_assets(app)
+
+# Сценарий по умолчанию считаем при старте, чтобы /?run=1 отдавался из памяти
+try:
+    get_default_outputs()
+except Exception as exc:
+    print(f"Не удалось предварительно рассчитать сценарий по умолчанию: {exc}")
+
+# Имена файлов (без расширения) в static/images для изображений из run_simulation
+IMAGE_FILES = {
+    'figure1': 'figure',
+    'figure2': 'disturbances',
+    'diagram1': 'diagram',
+    'diagram2': 'diagram2',
+    'diagram3': 'diagram3',
+    'diagram4': 'diagram4',
+    'diagram5': 'diagram5',
+}
+
+def save_images(outputs):
+    """Сохраняет изображения из outputs['images_b64'] в static/images; возвращает имена изменившихся.
+
+    Неизменившиеся файлы не перезаписываются, поэтому их URL (с хэшем
+    содержимого) остаются прежними и браузер берёт их из кэша.
+    """
+    # Профиль 'trajectory' (в том числе выданный под нагрузкой) изображений не содержит
+    if not outputs.get('images_b64'):
+        return []
+    # Изображения декодируются по одному, чтобы не держать в памяти все копии сразу
+    images = ((stem, base64.b64decode(outputs['images_b64'][key]))
+              for key, stem in IMAGE_FILES.items() if key in outputs.get('images_b64', {}))
+    with memory.stage('save_images'):
+        return save_image_files(images, outputs.get('format', 'png'))
+
+def changed_urls(changed):
+    """Новые URL изменившихся изображений (с хэшем содержимого)"""
+    return {stem: image_url(stem) for stem in changed}
+
+# Полноразмерные изображения после быстрого предпросмотра строятся в фоне по одному.
+# Номер запуска нужен, чтобы старый фоновый расчёт не затёр изображения более нового.
+# Ждёт не больше одной задачи — самая новая: более ранние заменяются, не начавшись.
+_full_render = ThreadPoolExecutor(max_workers=1)
+_pending_full = {}
+_run_counter = itertools.count(1)
+_latest_run = 0
+_latest_run_lock = threading.Lock()
+
+def _next_run():
+    global _latest_run
+    with _latest_run_lock:
+        _latest_run = next(_run_counter)
+        return _latest_run
+
+def _schedule_full_render(run_id, args, kwargs):
+    with _latest_run_lock:
+        queued = 'job' in _pending_full
+        _pending_full['job'] = (run_id, args, kwargs)
+    if not queued:
+        _full_render.submit(_render_full)
+
+def _render_full():
+    with _latest_run_lock:
+        run_id, args, kwargs = _pending_full.pop('job')
+        if run_id != _latest_run:
+            return
+    try:
+        # Фоновая отрисовка проходит через то же ограничение нагрузки;
+        # если полный профиль не уложился, предпросмотр остаётся как есть
+        outputs, _ = admission.run(args, profile='full', **kwargs)
+        if outputs['profile'] != 'full':
+            return
+        with _latest_run_lock:
+            if run_id == _latest_run:
+                save_images(outputs)
+    except Overloaded:
+        app.logger.warning("Фоновая отрисовка пропущена: сервер перегружен")
+    except Exception as exc:
+        print(f"Ошибка фоновой отрисовки: {exc}")
+
+@app.after_request
+def check_memory_budget(response):
+    # При превышении бюджета памяти кэши очищаются; если не помогло — процесс просит перезапуск
+    if memory.check_budget():
+        response.headers['X-Worker-Recycle'] = '1'
+    return response
+
+def overloaded_page(exc):
+    """Главная страница с ошибкой перегрузки: 503 и Retry-After"""
+    response = make_response(render_template('index.html', 
+                        defaults=build_default_inputs(), 
+                        values=None, 
+                        ran=False, 
+                        error=str(exc),
+                        u_labels=U_LABELS,
+                        get_u_variable_for_equation=get_u_variable_for_equation), 503)
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response
+
+def overloaded_json(exc):
+    """Ответ JSON-обработчика при перегрузке: 503 и Retry-After"""
+    response = jsonify({"status": "Ошибка", "error": str(exc)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response
 
 def subscript(number):
     """Convert number to subscript string"""
@@ -25,12 +138,8 @@ def index():
         if request.args.get('run') == '1':
             defaults = build_default_inputs()
             try:
-                outputs = run_simulation(
-                    defaults['u'], 
-                    defaults['faks'], 
-                    defaults['equations'], 
-                    defaults['u_restrictions']
-                )
+                # Пересчёт (если кэш очищен) занимает место, как и другие расчёты
+                _, outputs = get_default_outputs(guard=lambda: admission.slot('render'))
                 
                 values = {
                     'u': defaults['u'],
@@ -39,14 +148,19 @@ def index():
                     'u_restrictions': defaults['u_restrictions']
                 }
                 
-                return render_template('index.html', 
+                response = make_response(render_template('index.html', 
                                     defaults=defaults, 
                                     values=values,
                                     ran=True, 
                                     outputs=outputs,
                                     u_labels=U_LABELS,
                                     get_u_variable_for_equation=get_u_variable_for_equation,
-                                    success="Модель успешно выполнена с фиксированными значениями")
+                                    success="Модель успешно выполнена с фиксированными значениями"))
+                response.add_etag()
+                response.cache_control.no_cache = True
+                return response.make_conditional(request)
+            except Overloaded as exc:
+                return overloaded_page(exc)
             except Exception as exc:
                 return render_template('index.html', 
                                     defaults=defaults, 
@@ -76,7 +190,18 @@ def index():
                     )
             
             # Запуск симуляции
-            outputs = run_simulation(u, faks, equations, restrictions)
+            sharpness = request.form.get('sharpness')
+            quality = request.form.get('quality', 'full')
+            args = (u, faks, equations, restrictions)
+            kwargs = {
+                'stop_on_breach': request.form.get('stop_on_breach') == '1',
+                'sharpness': float(sharpness) if sharpness else None,
+                'fmt': image_formats.negotiate(request.accept_mimetypes, request.form.get('format')),
+            }
+            outputs, decision = admission.run(args, profile=quality, **kwargs)
+            if decision == 'shared':
+                app.logger.info("Результат получен от одновременного одинакового запроса")
+            degraded = is_degraded(quality, outputs['profile'])
             
             values = {
                 'u': u,
@@ -85,37 +210,35 @@ def index():
                 'u_restrictions': restrictions
             }
             
-            # Сохраняем изображения в static/images
-            import base64
+            # Сохраняем изображения в static/images (только изменившиеся)
+            run_id = _next_run()
+            changed_images = {}
+            with _latest_run_lock:
+                if run_id == _latest_run:
+                    changed_images = changed_urls(save_images(outputs))
             
-            # Сохраняем графики характеристик
-            if 'images_b64' in outputs:
-                # График характеристик
-                fig1_data = base64.b64decode(outputs['images_b64']['figure1'])
-                with open('static/images/figure.png', 'wb') as f:
-                    f.write(fig1_data)
-                
-                # График возмущений
-                fig2_data = base64.b64decode(outputs['images_b64']['figure2'])
-                with open('static/images/disturbances.png', 'wb') as f:
-                    f.write(fig2_data)
-                
-                # Диаграммы радара
-                for i, key in enumerate(['diagram1', 'diagram2', 'diagram3', 'diagram4', 'diagram5']):
-                    img_data = base64.b64decode(outputs['images_b64'][key])
-                    filename = f'static/images/diagram{"" if i==0 else i+1}.png'
-                    with open(filename, 'wb') as f:
-                        f.write(img_data)
+            # После предпросмотра полноразмерные изображения строятся в фоне
+            # (под нагрузкой — нет, чтобы не добавлять работы)
+            if quality == 'preview' and not degraded:
+                _schedule_full_render(run_id, args, kwargs)
+            
+            # Шаблону изображения не нужны: base64-строки не держатся до конца отрисовки
+            summary = {k: v for k, v in outputs.items() if k != 'images_b64'}
+            del outputs
             
             return render_template('index.html', 
                                 defaults=None, 
                                 values=values, 
                                 ran=True, 
-                                outputs=outputs,
+                                outputs=summary,
+                                changed_images=changed_images,
+                                degraded=degraded,
                                 u_labels=U_LABELS,
                                 get_u_variable_for_equation=get_u_variable_for_equation,
                                 success="Модель успешно выполнена с пользовательскими значениями")
             
+        except Overloaded as exc:
+            return overloaded_page(exc)
         except Exception as exc:
             defaults = build_default_inputs()
             return render_template('index.html', 
@@ -126,17 +249,24 @@ def index():
                                 u_labels=U_LABELS,
                                 get_u_variable_for_equation=get_u_variable_for_equation)
 
+def conditional_page(template):
+    """Страница с ETag: при совпадении If-None-Match отдаётся 304"""
+    response = make_response(render_template(template))
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/graphic')
 def get_graphic():
-    return render_template('graphic.html')
+    return conditional_page('graphic.html')
 
 @app.route('/diagrams')
 def get_diagrams():
-    return render_template('diagrams.html')
+    return conditional_page('diagrams.html')
 
 @app.route('/facks')
 def get_facks():
-    return render_template('facks.html')
+    return conditional_page('facks.html')
 
 @app.route('/clear')
 def clear():
@@ -152,17 +282,229 @@ def draw_graphics():
         from process import process
         
         # Запускаем обработку
-        process(
-            data.get("initial_equations", []),
-            data.get("faks", []),
-            data.get("equations", []),
-            data.get("restrictions", [])
-        )
+        with admission.slot('render'):
+            result = process(
+                data.get("initial_equations", []),
+                data.get("faks", []),
+                data.get("equations", []),
+                data.get("restrictions", []),
+                fmt=image_formats.negotiate(request.accept_mimetypes, data.get("format"))
+            )
         
-        return jsonify({"status": "Выполнено"})
+        return jsonify({"status": "Выполнено", **result, "urls": changed_urls(result['changed'])})
+    except Overloaded as e:
+        return overloaded_json(e)
     except Exception as e:
         print(f"Ошибка в draw_graphics: {e}")
         return jsonify({"status": "Ошибка", "error": str(e)})
 
+@app.route('/bulk', methods=['POST'])
+def bulk_route():
+    """Пакетный расчёт: JSONL-поток сценариев на входе, JSONL-поток результатов на выходе"""
+    from bulk import run_bulk, CHUNK_SIZE, MAX_CHUNK_SIZE
+    
+    try:
+        chunk_size = max(1, min(MAX_CHUNK_SIZE, int(request.args.get('chunk', CHUNK_SIZE))))
+        points = max(2, min(1000, int(request.args.get('points', 50))))
+    except ValueError as e:
+        return jsonify({"status": "Ошибка", "error": str(e)})
+    trajectory = request.args.get('trajectory') == '1'
+    
+    # Поток занимает место для расчётов траекторий до закрытия ответа
+    slot = ExitStack()
+    try:
+        slot.enter_context(admission.slot('trajectory'))
+    except Overloaded as e:
+        return overloaded_json(e)
+    
+    # Тело читается построчно по мере расчёта, без загрузки целиком
+    lines = iter(request.stream.readline, b'')
+    response = Response(stream_with_context(run_bulk(lines, chunk_size, points, trajectory)),
+                        mimetype='application/x-ndjson')
+    response.call_on_close(slot.close)
+    return response
+
+@app.route('/export', methods=['POST'])
+def export_route():
+    """Выгрузка t, траектории, возмущений и показателей расчёта (CSV, NPZ, Parquet, Arrow)"""
+    try:
+        data = request.get_json()
+        
+        from export import RunSource, export_stream, download_name, FORMATS
+        
+        fmt = data.get("format", "csv")
+        table = data.get("table", "trajectory")
+        with admission.slot('trajectory'):
+            source = RunSource(
+                [float(v) for v in data.get("initial_equations", [])],
+                [[float(v) for v in pair] for pair in data.get("faks", [])],
+                [[float(v) for v in pair] for pair in data.get("equations", [])],
+                [float(v) for v in data.get("restrictions", [])],
+                points=max(2, min(100000, int(data.get("points", 50))))
+            )
+        stream = export_stream(source, fmt, table)
+    except Overloaded as e:
+        return overloaded_json(e)
+    except Exception as e:
+        print(f"Ошибка в export: {e}")
+        return jsonify({"status": "Ошибка", "error": str(e)})
+    
+    return Response(stream, mimetype=FORMATS[fmt][0], headers={
+        'Content-Disposition': f'attachment; filename={download_name("run", fmt, table)}'})
+
+@app.route('/export/batch', methods=['GET'])
+def export_batch_route():
+    """Потоковая выгрузка результатов batch.py из каталога внутри BATCH_ROOT"""
+    try:
+        from export import BatchSource, batch_dir, export_stream, download_name, FORMATS
+        
+        fmt = request.args.get("format", "csv")
+        table = request.args.get("table", "trajectory")
+        source = BatchSource(batch_dir(request.args.get("dir", "")))
+        stream = export_stream(source, fmt, table)
+    except Exception as e:
+        print(f"Ошибка в export/batch: {e}")
+        return jsonify({"status": "Ошибка", "error": str(e)})
+    
+    return Response(stream_with_context(stream), mimetype=FORMATS[fmt][0], headers={
+        'Content-Disposition': f'attachment; filename={download_name("batch", fmt, table)}'})
+
+@app.route('/memory', methods=['GET', 'POST'])
+def memory_route():
+    """Память процесса: RSS, живые фигуры, кэши, этапы; POST включает tracemalloc или очищает кэши"""
+    try:
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            if data.get("trace") == "start":
+                memory.start_tracing()
+            elif data.get("trace") == "stop":
+                memory.stop_tracing()
+            if data.get("trim"):
+                memory.trim_caches()
+        
+        top = max(0, min(100, int(request.args.get("top", 10))))
+        return jsonify({"status": "Выполнено", **memory.report(top)})
+    except Exception as e:
+        print(f"Ошибка в memory: {e}")
+        return jsonify({"status": "Ошибка", "error": str(e)})
+
+@app.route('/admission')
+def admission_route():
+    """Ограничение нагрузки: занятые места, очередь, оценки времени, принятые решения"""
+    from web_core import coalescing_stats
+    return jsonify({"status": "Выполнено", **admission.stats(), "coalescing": coalescing_stats()})
+
+@app.route('/preview', methods=['POST'])
+def preview_route():
+    """Быстрый предпросмотр траектории для ползунков: суррогат или решатель"""
+    try:
+        data = request.get_json()
+        
+        from surrogate import preview, DEFAULT_TOLERANCE
+        
+        result = preview(
+            [float(v) for v in data.get("initial_equations", [])],
+            [[float(v) for v in pair] for pair in data.get("faks", [])],
+            [[float(v) for v in pair] for pair in data.get("equations", [])],
+            [float(v) for v in data.get("restrictions", [])],
+            tolerance=float(data.get("tolerance", DEFAULT_TOLERANCE)),
+            exact=bool(data.get("exact", False)),
+            guard=lambda: admission.slot('trajectory')
+        )
+        
+        return jsonify({"status": "Выполнено", **result})
+    except Overloaded as e:
+        return overloaded_json(e)
+    except Exception as e:
+        print(f"Ошибка в preview: {e}")
+        return jsonify({"status": "Ошибка", "error": str(e)})
+
+@app.route('/continue', methods=['POST'])
+def continue_route():
+    """Продолжение расчёта до t=T: считается только новый интервал"""
+    try:
+        data = request.get_json()
+        
+        from checkpoints import continue_to, MAX_T_END
+        
+        t_end = float(data.get("t_end", 1.0))
+        if not t_end <= MAX_T_END:
+            return jsonify({"status": "Ошибка", "error": f"t_end должен быть не больше {MAX_T_END:g}"}), 400
+        
+        with admission.slot('render'):
+            result = continue_to(
+                [float(v) for v in data.get("initial_equations", [])],
+                [[float(v) for v in pair] for pair in data.get("faks", [])],
+                [[float(v) for v in pair] for pair in data.get("equations", [])],
+                [float(v) for v in data.get("restrictions", [])],
+                t_end,
+                profile=data.get("profile", "full"),
+                fmt=image_formats.negotiate(request.accept_mimetypes, data.get("format"))
+            )
+        
+        return jsonify({"status": "Выполнено", **result})
+    except Overloaded as e:
+        return overloaded_json(e)
+    except Exception as e:
+        print(f"Ошибка в continue: {e}")
+        return jsonify({"status": "Ошибка", "error": str(e)})
+
+@app.route('/sensitivity', methods=['POST'])
+def sensitivity_route():
+    """Чувствительность выбранной характеристики ко всем входам и торнадо-диаграмма"""
+    try:
+        data = request.get_json()
+        
+        from sensitivity import analyze, draw_tornado
+        
+        target = data.get("target", "X8")
+        with admission.slot('render'):
+            result = analyze(
+                [float(v) for v in data.get("initial_equations", [])],
+                [[float(v) for v in pair] for pair in data.get("faks", [])],
+                [[float(v) for v in pair] for pair in data.get("equations", [])],
+                target=target
+            )
+            tornado = draw_tornado(result['ranking'], target) if data.get("chart", True) else None
+        
+        response = {
+            "status": "Выполнено",
+            "target": target,
+            "ranking": result['ranking'],
+        }
+        if data.get("full", False):
+            response["t"] = result['t'].tolist()
+            response["sensitivities"] = result['S'].round(6).tolist()
+        if tornado is not None:
+            response["tornado_b64"] = tornado
+        return jsonify(response)
+    except Overloaded as e:
+        return overloaded_json(e)
+    except Exception as e:
+        print(f"Ошибка в sensitivity: {e}")
+        return jsonify({"status": "Ошибка", "error": str(e)})
+
+@app.route('/equilibrium', methods=['POST'])
+def equilibrium_route():
+    """Установившийся режим, собственные числа и активные ограничения без интегрирования"""
+    try:
+        data = request.get_json()
+        
+        from equilibrium import analyze
+        
+        restrictions = data.get("restrictions")
+        initial_equations = data.get("initial_equations")
+        result = analyze(
+            [[float(v) for v in pair] for pair in data.get("faks", [])],
+            [[float(v) for v in pair] for pair in data.get("equations", [])],
+            restrictions=[float(v) for v in restrictions] if restrictions else None,
+            initial_equations=[float(v) for v in initial_equations] if initial_equations else None
+        )
+        
+        return jsonify({"status": "Выполнено", **result})
+    except Exception as e:
+        print(f"Ошибка в equilibrium: {e}")
+        return jsonify({"status": "Ошибка", "error": str(e)})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,265 @@
+# batch.py
+"""Пакетный расчёт сценариев без Flask.
+
+Пример:
+    python batch.py scenarios.csv -o results --workers 4
+
+Каждая строка CSV/JSONL — один сценарий. Поля как у формы на главной странице
+(u1..u8, u_restrictions1..u_restrictions8, fak1_a..fak5_b, f1_k..f18_b) либо,
+для JSONL, вложенные списки 'u', 'faks', 'equations', 'u_restrictions'.
+Необязательное поле 'id' задаёт имя сценария.
+
+Результаты пишутся по частям (chunk_XXXXX.npz + chunk_XXXXX.jsonl); уже
+готовые части при повторном запуске пропускаются. С --memmap траектории
+пишутся в общее хранилище sweep_store.TrajectoryStore (каталог store/), а
+готовность части отмечает её chunk_XXXXX.jsonl. С --render изображения
+строятся по уже рассчитанной траектории и пишутся в images/<номер>_<id>/
+(в имени каталога из id остаются только буквы, цифры, '-', '_' и '.').
+
+Параметры запуска (размер части, число точек, режим хранения, хеш входных
+сценариев) записываются в manifest.json. Продолжение возможно только с теми
+же параметрами; иначе запуск прерывается, а --restart удаляет старые части
+и считает заново.
+"""
+import argparse
+import base64
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from web_core import parse_form, render_images, simulate
+from sweep_store import TrajectoryStore
+
+IMAGE_NAMES = {
+    'figure1': 'figure.png',
+    'figure2': 'disturbances.png',
+    'diagram1': 'diagram.png',
+    'diagram2': 'diagram2.png',
+    'diagram3': 'diagram3.png',
+    'diagram4': 'diagram4.png',
+    'diagram5': 'diagram5.png',
+}
+
+
+def read_scenarios(path):
+    """Читает сценарии из CSV или JSONL; возвращает список (id, u, faks, equations, restrictions)"""
+    if path.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    scenarios = []
+    for number, row in enumerate(rows):
+        scenario_id = str(row.get('id', number))
+        if 'u' in row:
+            u, faks, equations, restrictions = (
+                row['u'], row['faks'], row['equations'], row['u_restrictions'])
+        else:
+            u, faks, equations, restrictions = parse_form(row)
+        scenarios.append((scenario_id, u, faks, equations, restrictions))
+    return scenarios
+
+
+def summarize(scenario_id, t, data, crossings):
+    """Итоговые показатели сценария"""
+    first_breach = {}
+    for c in crossings:
+        if c['kind'] == 'restriction' and c['direction'] == 'up':
+            first_breach.setdefault(c['variable'], c['t'])
+    return {
+        'id': scenario_id,
+        'final': [round(float(v), 6) for v in data[-1]],
+        'max': [round(float(v), 6) for v in data.max(axis=0)],
+        'breaches': len(first_breach),
+        'first_breach': first_breach,
+        'crossings': crossings,
+    }
+
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _manifest(scenarios, chunk_size, points, memmap, float32):
+    """Параметры запуска, от которых зависит содержимое готовых частей"""
+    digest = hashlib.sha256(
+        json.dumps(scenarios, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return {
+        'scenarios': len(scenarios),
+        'input_sha256': digest,
+        'chunk_size': chunk_size,
+        'points': points,
+        'memmap': memmap,
+        'float32': float32 if memmap else False,
+    }
+
+
+def _clear_results(out_dir):
+    """Удаляет части, хранилище и манифест прошлого запуска"""
+    for path in glob.glob(os.path.join(out_dir, 'chunk_*')):
+        os.remove(path)
+    for name in (MANIFEST_NAME, 'summary.jsonl'):
+        if os.path.exists(os.path.join(out_dir, name)):
+            os.remove(os.path.join(out_dir, name))
+    shutil.rmtree(os.path.join(out_dir, 'store'), ignore_errors=True)
+
+
+def _check_manifest(out_dir, manifest, restart):
+    """Сверяет параметры с прошлым запуском; при расхождении — ошибка или (restart) очистка"""
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = None
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    leftovers = glob.glob(os.path.join(out_dir, 'chunk_*')) or os.path.exists(os.path.join(out_dir, 'store'))
+
+    if previous != manifest and (previous is not None or leftovers):
+        if not restart:
+            if previous is None:
+                raise ValueError(f"В {out_dir} есть результаты без {MANIFEST_NAME}; "
+                                 f"запустите с --restart")
+            changed = ', '.join(k for k in manifest if previous.get(k) != manifest[k])
+            raise ValueError(f"Параметры не совпадают с прошлым запуском в {out_dir} "
+                             f"({changed}); запустите с --restart или укажите другой каталог")
+        print("Параметры изменились: прошлые результаты удалены", file=sys.stderr)
+        _clear_results(out_dir)
+
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _chunk_done(out_dir, index, memmap):
+    suffix = '.jsonl' if memmap else '.npz'
+    return os.path.exists(os.path.join(out_dir, f'chunk_{index:05d}{suffix}'))
+
+
+def _run_chunk(job):
+    chunk_index, start, scenarios, out_dir, t_grid, render, memmap = job
+    prefix = os.path.join(out_dir, f'chunk_{chunk_index:05d}')
+
+    ids, trajectories, summaries = [], [], []
+    for offset, (scenario_id, u, faks, equations, restrictions) in enumerate(scenarios):
+        try:
+            t, data, crossings = simulate(u, faks, equations, restrictions, t_grid=t_grid)
+        except Exception as exc:
+            summaries.append({'id': scenario_id, 'error': str(exc)})
+            data = np.full((len(t_grid), 8), np.nan)
+        else:
+            summaries.append(summarize(scenario_id, t, data, crossings))
+            if render:
+                image_dir = os.path.join(out_dir, 'images', _image_dir_name(start + offset, scenario_id))
+                _render(image_dir, t, data, u, faks, restrictions, crossings)
+        ids.append(scenario_id)
+        trajectories.append(data)
+
+    if memmap:
+        store = TrajectoryStore(os.path.join(out_dir, 'store'), mode='r+')
+        store.write(start, np.array(trajectories), [s[4] for s in scenarios])
+        # jsonl пишется последним и через переименование: его наличие означает, что часть готова
+        _write_summaries(prefix + '.tmp.jsonl', summaries)
+        os.replace(prefix + '.tmp.jsonl', prefix + '.jsonl')
+    else:
+        _write_summaries(prefix + '.jsonl', summaries)
+        # npz пишется последним и через переименование: его наличие означает, что часть готова
+        np.savez(prefix + '.tmp.npz', ids=np.array(ids), t=t_grid, trajectories=np.array(trajectories))
+        os.replace(prefix + '.tmp.npz', prefix + '.npz')
+    return chunk_index, len(scenarios)
+
+
+def _write_summaries(path, summaries):
+    with open(path, 'w', encoding='utf-8') as f:
+        for summary in summaries:
+            f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+
+
+def _image_dir_name(index, scenario_id):
+    """Имя каталога изображений: номер сценария и id без символов, опасных в пути"""
+    safe_id = re.sub(r'[^\w.-]', '_', scenario_id)[:64]
+    return f'{index:06d}_{safe_id}'
+
+
+def _render(image_dir, t, data, u, faks, restrictions, crossings):
+    """Изображения по уже рассчитанной траектории"""
+    os.makedirs(image_dir, exist_ok=True)
+    images_b64 = render_images(t, data, u, faks, restrictions, crossings)
+    for key, name in IMAGE_NAMES.items():
+        with open(os.path.join(image_dir, name), 'wb') as f:
+            f.write(base64.b64decode(images_b64[key]))
+
+
+def run_batch(scenarios, out_dir, workers=None, chunk_size=64, points=50, render=False,
+              memmap=False, float32=False, restart=False):
+    os.makedirs(out_dir, exist_ok=True)
+    _check_manifest(out_dir, _manifest(scenarios, chunk_size, points, memmap, float32), restart)
+    t_grid = np.linspace(0, 1, points)
+
+    store_dir = os.path.join(out_dir, 'store')
+    if memmap and not TrajectoryStore.exists(store_dir):
+        store = TrajectoryStore.create(store_dir, len(scenarios), t_grid, float32=float32)
+        store.write_params(
+            {'index': i, 'id': s[0], 'u': s[1], 'faks': s[2], 'equations': s[3], 'u_restrictions': s[4]}
+            for i, s in enumerate(scenarios))
+        del store
+
+    starts = range(0, len(scenarios), chunk_size)
+    jobs = [(index, start, scenarios[start:start + chunk_size], out_dir, t_grid, render, memmap)
+            for index, start in enumerate(starts)
+            if not _chunk_done(out_dir, index, memmap)]
+
+    total = len(scenarios)
+    done = total - sum(len(job[2]) for job in jobs)
+    if done:
+        print(f"Продолжение: {done} из {total} сценариев уже рассчитаны", file=sys.stderr)
+
+    started = time.time()
+    with Pool(processes=workers) as pool:
+        # Части раздаются по одной: каждая уже содержит chunk_size сценариев
+        for _, count in pool.imap_unordered(_run_chunk, jobs):
+            done += count
+            elapsed = time.time() - started
+            print(f"\rОбработано {done}/{total} ({elapsed:.1f} с)", end='', file=sys.stderr)
+    print(file=sys.stderr)
+
+    # Общий файл итогов собирается из готовых частей
+    with open(os.path.join(out_dir, 'summary.jsonl'), 'w', encoding='utf-8') as out:
+        for index in range(len(starts)):
+            with open(os.path.join(out_dir, f'chunk_{index:05d}.jsonl'), 'r', encoding='utf-8') as f:
+                out.write(f.read())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный расчёт сценариев модели")
+    parser.add_argument('input', help="CSV или JSONL со сценариями")
+    parser.add_argument('-o', '--out', default='batch_results', help="каталог результатов")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="сценариев в одной части")
+    parser.add_argument('--points', type=int, default=50, help="число точек по времени")
+    parser.add_argument('--render', action='store_true', help="строить графики для каждого сценария")
+    parser.add_argument('--memmap', action='store_true', help="писать траектории в общее хранилище .npy")
+    parser.add_argument('--float32', action='store_true', help="хранить траектории в float32")
+    parser.add_argument('--restart', action='store_true',
+                        help="удалить результаты прошлого запуска с другими параметрами")
+    args = parser.parse_args(argv)
+
+    scenarios = read_scenarios(args.input)
+    try:
+        run_batch(scenarios, args.out, workers=args.workers, chunk_size=args.chunk_size,
+                  points=args.points, render=args.render, memmap=args.memmap,
+                  float32=args.float32, restart=args.restart)
+    except ValueError as exc:
+        parser.exit(1, f"Ошибка: {exc}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# bulk.py
+"""Пакетный расчёт сценариев потоком JSONL без построения изображений.
+
+Каждая входная строка — сценарий с полями, как у /draw_graphics:
+initial_equations, faks, equations, restrictions (и необязательным id).
+Сценарии собираются в части по chunk_size и считаются одним векторизованным
+решением (CompiledModel.integrate_batch); результаты выдаются по одной
+строке JSONL на сценарий в порядке входа. В памяти держится не больше одной
+части, поэтому длина входа не ограничена.
+"""
+import json
+
+import numpy as np
+
+from export import first_breach_times
+from model_spec import DEFAULT_MODEL
+from web_core import normalize_trajectory
+
+CHUNK_SIZE = 256
+MAX_CHUNK_SIZE = 4096
+
+
+def parse_scenario(obj):
+    """Проверяет поля сценария; возвращает (u, faks, equations, restrictions) в виде массивов"""
+    if not isinstance(obj, dict):
+        raise ValueError("Сценарий должен быть объектом JSON")
+    try:
+        u = np.asarray(obj['initial_equations'], dtype=float)
+        faks = np.asarray(obj['faks'], dtype=float)
+        equations = np.asarray(obj['equations'], dtype=float)
+        restrictions = np.asarray(obj['restrictions'], dtype=float)
+    except KeyError as exc:
+        raise ValueError(f"Нет поля {exc.args[0]}") from None
+    except (TypeError, ValueError):
+        raise ValueError("Поля сценария должны содержать числа") from None
+
+    n, m, q = DEFAULT_MODEL.n, DEFAULT_MODEL.m, len(DEFAULT_MODEL.transfers)
+    if u.shape != (n,) or restrictions.shape != (n,):
+        raise ValueError(f"initial_equations и restrictions должны содержать по {n} чисел")
+    if faks.shape != (m, 2):
+        raise ValueError(f"faks должен содержать {m} пар [a, b]")
+    if equations.shape != (q, 2):
+        raise ValueError(f"equations должен содержать {q} пар [k, b]")
+    if not all(np.isfinite(a).all() for a in (u, faks, equations, restrictions)):
+        raise ValueError("Значения должны быть конечными числами")
+    # Начальные значения ограничиваются, как в simulate
+    return np.clip(u, 0.1, 0.9), faks, equations, restrictions
+
+
+def _results(t, trajectories, restrictions, trajectory):
+    data = normalize_trajectory(trajectories)
+    maxima = data.max(axis=1)
+    breach_times = first_breach_times(t, data, restrictions)
+    for k in range(len(data)):
+        first_breach = {
+            DEFAULT_MODEL.variables[i]: round(float(breach_times[k, i]), 6)
+            for i in np.nonzero(~np.isnan(breach_times[k]))[0]
+        }
+        result = {
+            'final': data[k, -1].round(6).tolist(),
+            'max': maxima[k].round(6).tolist(),
+            'breaches': len(first_breach),
+            'first_breach': first_breach,
+        }
+        if trajectory:
+            result['trajectory'] = data[k].round(6).tolist()
+        yield result
+
+
+def _solve_chunk(chunk, t, trajectory):
+    """Результаты для части: ошибки разбора сохраняются на своих местах"""
+    valid = [entry for entry in chunk if 'error' not in entry]
+    results = iter(())
+    if valid:
+        u, faks, equations, restrictions = (np.array([e['params'][j] for e in valid]) for j in range(4))
+        Y = DEFAULT_MODEL.integrate_batch(u, t, faks, equations)
+        results = _results(t, Y, restrictions, trajectory)
+    for entry in chunk:
+        head = {'line': entry['line']}
+        if entry.get('id') is not None:
+            head['id'] = entry['id']
+        if 'error' in entry:
+            yield dict(head, error=entry['error'])
+        else:
+            yield dict(head, **next(results))
+
+
+def run_bulk(lines, chunk_size=CHUNK_SIZE, points=50, trajectory=False):
+    """Генератор строк JSONL с результатами для итератора входных строк (bytes или str)"""
+    t = np.linspace(0, 1, points)
+    chunk = []
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        entry = {'line': number}
+        try:
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"Некорректный JSON: {exc.msg}") from None
+            if isinstance(obj, dict):
+                entry['id'] = obj.get('id')
+            entry['params'] = parse_scenario(obj)
+        except ValueError as exc:
+            entry['error'] = str(exc)
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield from _dump(_solve_chunk(chunk, t, trajectory))
+            chunk = []
+    if chunk:
+        yield from _dump(_solve_chunk(chunk, t, trajectory))
+
+
+def _dump(results):
+    for result in results:
+        yield json.dumps(result, ensure_ascii=False) + '\n'
@@ -0,0 +1,167 @@
+# checkpoints.py
+"""Продолжение расчёта без пересчёта с t=0.
+
+Для каждого набора параметров (ключ — хэш параметров) хранится контрольная
+точка: траектория, конечное состояние и время, последний шаг решателя,
+найденные пересечения и уже построенные диаграммы. Продолжение до t=T
+интегрирует только новый интервал и перестраивает только изменившиеся
+изображения: графики характеристик и возмущений и диаграммы в новых
+моментах времени.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import memory
+from model_spec import DEFAULT_MODEL
+from web_core import (create_graphics, draw_radar_series, image_sizes, normalize_trajectory,
+                      restriction_levels)
+
+# Сколько контрольных точек держать в памяти
+MAX_CHECKPOINTS = 32
+
+# Шаг сетки по времени, как у run_simulation: 50 точек на [0, 1]
+GRID_STEP = 1.0 / 49
+
+# Наибольший допустимый конец расчёта: не больше ~4900 точек траектории
+MAX_T_END = 100.0
+
+
+def params_key(initial_equations, factors, equations, restrictions):
+    payload = json.dumps([list(map(float, initial_equations[:8])),
+                          [list(map(float, pair)) for pair in factors],
+                          [list(map(float, pair)) for pair in equations],
+                          list(map(float, restrictions[:8]))])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class Checkpoint:
+    def __init__(self, key, initial_equations, factors, equations, restrictions):
+        self.key = key
+        self.initial_equations = list(initial_equations[:8])
+        self.factors = factors
+        self.equations = equations
+        self.restrictions = list(restrictions[:8])
+        self.t = None
+        self.raw = None
+        self.crossings = []
+        self.last_step = None
+        self.radar_cache = {}
+        self.images = None
+        self.style = ('full', 'png')
+        self.lock = threading.Lock()
+
+    @property
+    def t_end(self):
+        return float(self.t[-1]) if self.t is not None else 0.0
+
+    def extend(self, t_end):
+        """Интегрирует только [текущий конец, t_end]; возвращает True, если траектория изменилась"""
+        if self.t is None:
+            y0 = np.clip(np.array(self.initial_equations, dtype=float), 0.1, 0.9)
+            t_start = 0.0
+        elif t_end <= self.t_end + 1e-12:
+            return False
+        else:
+            y0 = self.raw[-1]
+            t_start = self.t_end
+
+        n = max(2, int(round((t_end - t_start) / GRID_STEP)) + 1)
+        grid = np.linspace(t_start, t_end, n)
+        options = {'first_step': self.last_step} if self.last_step else {}
+        stats = {}
+        t, raw, crossings = DEFAULT_MODEL.integrate_events(
+            y0, grid, self.factors, self.equations,
+            restriction_levels(self.restrictions), stats=stats, **options)
+
+        if self.t is None:
+            self.t, self.raw = t, raw
+        else:
+            # Первая точка нового участка совпадает с последней точкой старого
+            self.t = np.concatenate([self.t, t[1:]])
+            self.raw = np.vstack([self.raw, raw[1:]])
+            crossings = [c for c in crossings if c['t'] > t_start]
+        self.crossings.extend(crossings)
+        self.last_step = stats.get('last_step')
+        return True
+
+    def render(self, profile='full', fmt='png'):
+        """Все семь изображений; диаграммы берутся из кэша, если момент времени не изменился"""
+        if (profile, fmt) != self.style:
+            # Диаграммы в кэше построены с другим качеством или в другом формате
+            self.radar_cache.clear()
+            self.style = (profile, fmt)
+        data = normalize_trajectory(self.raw)
+        cached = set(self.radar_cache)
+        figures = create_graphics(self.t, data, self.factors, self.crossings, profile, fmt)
+        radars = draw_radar_series(data, self.initial_equations, self.restrictions,
+                                   self.t, cache=self.radar_cache, profile=profile, fmt=fmt)
+        rendered = ['figure1', 'figure2'] + [
+            f'diagram{i + 1}' for i, moment in enumerate(['initial'] + self._radar_moments())
+            if moment not in cached
+        ]
+        self.images = {'figure1': figures[0], 'figure2': figures[1]}
+        self.images.update({f'diagram{i + 1}': img for i, img in enumerate(radars)})
+        # В кэше остаются только диаграммы текущих моментов времени
+        current = {'initial', *self._radar_moments()}
+        for moment in [m for m in self.radar_cache if m not in current]:
+            del self.radar_cache[moment]
+        return rendered
+
+    def _radar_moments(self):
+        n = len(self.t)
+        return [round(float(self.t[idx]), 9) for idx in (int(n / 4), int(n / 2), int(n * 3 / 4), -1)]
+
+
+_checkpoints = OrderedDict()
+_checkpoints_lock = threading.Lock()
+
+
+def _trim_checkpoints():
+    with _checkpoints_lock:
+        _checkpoints.clear()
+
+
+memory.register_cache('checkpoints', lambda: len(_checkpoints), _trim_checkpoints)
+
+
+def get_checkpoint(initial_equations, factors, equations, restrictions):
+    key = params_key(initial_equations, factors, equations, restrictions)
+    with _checkpoints_lock:
+        checkpoint = _checkpoints.get(key)
+        if checkpoint is None:
+            checkpoint = Checkpoint(key, initial_equations, factors, equations, restrictions)
+            _checkpoints[key] = checkpoint
+            while len(_checkpoints) > MAX_CHECKPOINTS:
+                _checkpoints.popitem(last=False)
+        else:
+            _checkpoints.move_to_end(key)
+    return checkpoint
+
+
+def continue_to(initial_equations, factors, equations, restrictions, t_end, profile='full', fmt='png'):
+    """Продолжает расчёт до t_end (от 1 до MAX_T_END) и возвращает результат с изображениями"""
+    t_end = float(t_end)
+    if not t_end <= MAX_T_END:
+        raise ValueError(f"t_end должен быть не больше {MAX_T_END:g}")
+    checkpoint = get_checkpoint(initial_equations, factors, equations, restrictions)
+    with checkpoint.lock:
+        if checkpoint.t is None:
+            checkpoint.extend(1.0)
+        changed = checkpoint.extend(max(1.0, t_end))
+        stale = changed or checkpoint.images is None or (profile, fmt) != checkpoint.style
+        rendered = checkpoint.render(profile, fmt) if stale else []
+        # Копии под блокировкой: после её снятия другой /continue может дополнить списки
+        return {
+            'key': checkpoint.key,
+            't_end': checkpoint.t_end,
+            'points': len(checkpoint.t),
+            'crossings': list(checkpoint.crossings),
+            'rendered': rendered,
+            'format': fmt,
+            'image_bytes': image_sizes(checkpoint.images),
+            'images_b64': dict(checkpoint.images),
+        }
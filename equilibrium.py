@@ -0,0 +1,160 @@
+# equilibrium.py
+"""Установившийся режим и устойчивость без интегрирования.
+
+После того как все возмущения F(t) = clip(a + b*t) упёрлись в границы,
+система становится автономной:
+
+    dX/dt = A·X + B·F∞ + C·clip(k·X[src] + b)
+
+При фиксированном наборе насыщенных функций влияния она линейна:
+dX/dt = M·X + c. Набор насыщенных функций подбирается итерацией: решаем
+линейную систему, проверяем, какие аргументы вышли за границы, повторяем.
+
+Если M вырождена (например, у X1 нет собственного затухания), равновесия
+по части характеристик нет: они меняются с постоянной скоростью (дрейф),
+а функции влияния от них со временем насыщаются.
+"""
+import time
+
+import numpy as np
+
+from model_spec import DEFAULT_MODEL
+
+# Допуск для нулевых собственных чисел и скоростей дрейфа
+TOLERANCE = 1e-9
+
+
+def saturated_factors(factors, model=DEFAULT_MODEL):
+    """Предельные значения возмущений и моменты их насыщения (None — не насыщается)"""
+    factors = np.asarray(factors, dtype=float).reshape(model.m, 2)
+    fa, fb = factors[:, 0], factors[:, 1]
+    lo, hi = model.factor_lo, model.factor_hi
+    limit = np.where(fb > 0, hi, np.where(fb < 0, lo, np.clip(fa, lo, hi)))
+    result = []
+    for j, name in enumerate(model.factors):
+        saturates_at = None
+        if fb[j] != 0:
+            saturates_at = max(0.0, float((limit[j] - fa[j]) / fb[j]))
+        result.append({'name': name, 'limit': float(limit[j]), 'saturates_at': saturates_at})
+    return limit, result
+
+
+def _affine_system(model, F, k, b, states):
+    """M и c для заданных состояний функций влияния ('linear', 'lo', 'hi')"""
+    A, B, C = model.A.toarray(), model.B.toarray(), model.C.toarray()
+    linear = np.array([s == 'linear' for s in states])
+    K = np.zeros((len(states), model.n))
+    K[np.arange(len(states)), model.tr_src] = np.where(linear, k, 0.0)
+    z = np.where(linear, b, np.where(np.array(states) == 'hi', model.transfer_hi, model.transfer_lo))
+    return A + C @ K, B @ F + C @ z
+
+
+def _steady_state(M, c):
+    """Частное решение x_p и скорость дрейфа v: X(t) ≈ x_p + v·t при t → ∞"""
+    U, s, Vt = np.linalg.svd(M)
+    null = s <= TOLERANCE * max(1.0, s[0])
+    if not null.any():
+        return np.linalg.solve(M, -c), np.zeros(len(c)), True
+    R = Vt[null].T          # правые нулевые векторы: M·r = 0
+    L = U[:, null]          # левые: lᵀ·M = 0, d(lᵀX)/dt = lᵀ·c
+    try:
+        v = R @ np.linalg.solve(L.T @ R, L.T @ c)
+    except np.linalg.LinAlgError:
+        v = np.zeros(len(c))
+    x_p = np.linalg.lstsq(M, v - c, rcond=None)[0]
+    return x_p, v, False
+
+
+def analyze(factors, equations, restrictions=None, initial_equations=None, model=DEFAULT_MODEL):
+    """Установившийся режим при насыщенных возмущениях.
+
+    Возвращает словарь: предельные возмущения, равновесие и дрейф каждой
+    характеристики, собственные числа и постоянные времени, активные
+    ограничения (функции влияния, скорости, диапазон отображения [0, 1])
+    и, если заданы restrictions, характеристики, которые со временем
+    превысят предел.
+    """
+    started = time.perf_counter()
+    F, factor_info = saturated_factors(factors, model)
+    _, _, k, b = model._params(factors, equations)
+    tlo, thi = model.transfer_lo, model.transfer_hi
+
+    states = ['linear'] * len(model.tr_src)
+    converged = False
+    for iteration in range(1, len(states) + 2):
+        M, c = _affine_system(model, F, k, b, states)
+        x_p, v, unique = _steady_state(M, c)
+        drifting = np.abs(v) > TOLERANCE
+        new_states = []
+        for e, src in enumerate(model.tr_src):
+            if drifting[src] and k[e] != 0:
+                new_states.append('hi' if k[e] * v[src] > 0 else 'lo')
+            else:
+                value = k[e] * x_p[src] + b[e]
+                new_states.append('lo' if value < tlo else 'hi' if value > thi else 'linear')
+        if new_states == states:
+            converged = True
+            break
+        states = new_states
+
+    eigenvalues, vectors = np.linalg.eig(M)
+    order = np.argsort(-eigenvalues.real)
+    eigenvalues, vectors = eigenvalues[order], vectors[:, order]
+    decays = eigenvalues.real < -TOLERANCE
+    time_constants = np.where(decays, -1.0 / np.where(decays, eigenvalues.real, -1.0), np.inf)
+
+    # Скорость дрейфа ограничена rate_bounds
+    rate = np.clip(v, model.rate_lo, model.rate_hi)
+    rate_clipped = drifting & (rate != v)
+
+    # Моды, входящие в каждую характеристику, и самая медленная из них
+    magnitude = np.abs(vectors)
+    modes = magnitude > TOLERANCE * magnitude.max(axis=1, keepdims=True)
+    slowest = np.where(modes, time_constants, 0.0).max(axis=1)
+    settles = ~drifting & ~(modes & ~decays).any(axis=1)
+
+    variables = {}
+    for i, name in enumerate(model.variables):
+        entry = {
+            'equilibrium': None if drifting[i] else float(x_p[i]),
+            'drift': float(rate[i]) if drifting[i] else 0.0,
+            'time_constant': float(slowest[i]) if np.isfinite(slowest[i]) else None,
+            'settles': bool(settles[i]),
+        }
+        if initial_equations is not None:
+            x0 = float(initial_equations[i])
+            target = rate[i] if drifting[i] else x_p[i] - x0
+            entry['trend'] = 'growing' if target > TOLERANCE else 'decaying' if target < -TOLERANCE else 'steady'
+        variables[name] = entry
+
+    transfers = [
+        {'name': model.transfers[model.tr_param[e]], 'argument': model.variables[src], 'bound': state}
+        for e, (src, state) in enumerate(zip(model.tr_src, states)) if state != 'linear'
+    ]
+    display = [name for name, entry in variables.items()
+               if entry['drift'] or not 0.0 <= entry['equilibrium'] <= 1.0]
+
+    result = {
+        'factors': factor_info,
+        'variables': variables,
+        'eigenvalues': [{'re': float(lam.real), 'im': float(lam.imag),
+                         'time_constant': float(tau) if np.isfinite(tau) else None}
+                        for lam, tau in zip(eigenvalues, time_constants)],
+        'stable': bool(decays.all()),
+        'unique': unique,
+        'active_clips': {
+            'transfers': transfers,
+            'rates': [name for name, clipped in zip(model.variables, rate_clipped) if clipped],
+            'display': display,
+        },
+        'converged': converged,
+        'iterations': iteration,
+    }
+    if restrictions is not None:
+        result['breaches'] = [
+            name for i, (name, entry) in enumerate(variables.items())
+            if entry['drift'] > 0 or (entry['equilibrium'] is not None
+                                      and entry['equilibrium'] >= restrictions[i])
+        ]
+    result['elapsed_us'] = round((time.perf_counter() - started) * 1e6, 1)
+    return result
@@ -0,0 +1,383 @@
+# export.py
+"""Выгрузка результатов: t, траектории (T, 8), кривые возмущений и показатели.
+
+Форматы: csv, npz (сжатый), а при установленном pyarrow — parquet и arrow
+(поток Arrow IPC). Источник — один расчёт (RunSource) или каталог пакетного
+расчёта batch.py (BatchSource). Данные читаются блоками сценариев, а запись
+идёт генераторами байтов, поэтому выгрузка пакета не держит его в памяти
+целиком.
+
+Таблицы (для csv, parquet, arrow):
+    trajectory — по строке на (сценарий, момент времени): run, id, t, X1..X8, F1..F5
+    metrics    — по строке на сценарий: итоговые и максимальные значения,
+                 моменты первого достижения предела и число нарушенных пределов
+NPZ содержит всё сразу: t, ids, trajectories, factors, restrictions и показатели.
+
+    python export.py batch_results -f parquet -o results.parquet
+"""
+import argparse
+import csv
+import glob
+import io
+import itertools
+import os
+import zipfile
+
+import numpy as np
+
+from model_spec import DEFAULT_MODEL
+from sweep_store import TrajectoryStore
+from web_core import simulate
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+VARIABLES = list(DEFAULT_MODEL.variables)
+FACTORS = list(DEFAULT_MODEL.factors)
+
+# Формат -> (MIME-тип, расширение файла)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'npz': ('application/zip', 'npz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+TABLES = ('trajectory', 'metrics')
+
+# Каталог, внутри которого ищутся результаты пакетных расчётов для /export/batch
+BATCH_ROOT = os.environ.get('BATCH_ROOT', 'batch_results')
+
+# Строк CSV в одном фрагменте потока
+CSV_ROWS = 2000
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if pa is not None or fmt in ('csv', 'npz')]
+
+
+def factor_curves(t, faks):
+    """Значения возмущений для пакета сценариев: faks (k, m, 2) -> (k, T, m)"""
+    faks = np.asarray(faks, dtype=float)
+    values = faks[:, None, :, 0] + faks[:, None, :, 1] * np.asarray(t)[None, :, None]
+    return np.clip(values, DEFAULT_MODEL.factor_lo, DEFAULT_MODEL.factor_hi)
+
+
+def first_breach_times(t, data, restrictions):
+    """Момент первого достижения предела (линейная интерполяция по сетке), (k, 8); NaN — не достигнут"""
+    above = data >= restrictions[:, None, :]
+    i = above.argmax(axis=1)
+    prev = np.maximum(i - 1, 0)
+    v0 = np.take_along_axis(data, prev[:, None, :], axis=1)[:, 0]
+    v1 = np.take_along_axis(data, i[:, None, :], axis=1)[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(i > 0, (restrictions - v0) / (v1 - v0), 0.0)
+    times = t[prev] + (t[i] - t[prev]) * frac
+    return np.where(above.any(axis=1), times, np.nan)
+
+
+class RunSource:
+    """Один расчёт с параметрами, как у формы"""
+
+    def __init__(self, initial_equations, factors, equations, restrictions, points=50, run_id='run'):
+        self.t, data, _ = simulate(initial_equations, factors, equations, restrictions,
+                                   t_grid=np.linspace(0, 1, points))
+        self.n = 1
+        self.dtype = np.dtype(float)
+        self.has_factors = self.has_restrictions = True
+        self._block = {
+            'start': 0,
+            'ids': [run_id],
+            'trajectory': data[None],
+            'factors': factor_curves(self.t, [factors]),
+            'restrictions': np.asarray(restrictions[:8], dtype=float)[None],
+        }
+
+    def ids(self):
+        return iter(self._block['ids'])
+
+    def blocks(self):
+        yield self._block
+
+
+class BatchSource:
+    """Результаты batch.py: хранилище store/ (режим --memmap) или части chunk_XXXXX.npz"""
+
+    def __init__(self, out_dir):
+        store_dir = os.path.join(out_dir, 'store')
+        if TrajectoryStore.exists(store_dir):
+            self.store = TrajectoryStore(store_dir)
+            self.t = self.store.t
+            self.n = len(self.store)
+            self.dtype = self.store.trajectories.dtype
+            self.has_factors = self.has_restrictions = True
+            return
+
+        # Без хранилища параметры сценариев не сохраняются: только траектории
+        self.store = None
+        self.chunks = sorted(path for path in glob.glob(os.path.join(out_dir, 'chunk_*.npz'))
+                             if not path.endswith('.tmp.npz'))
+        if not self.chunks:
+            raise FileNotFoundError(f"В {out_dir} нет результатов пакетного расчёта")
+        self.n = 0
+        for path in self.chunks:
+            with np.load(path) as data:
+                self.t = data['t']
+                self.n += len(data['ids'])
+                self.dtype = data['trajectories'].dtype
+        self.has_factors = self.has_restrictions = False
+
+    def ids(self):
+        if self.store is not None:
+            for row in self.store.params():
+                yield str(row['id'])
+            return
+        for path in self.chunks:
+            with np.load(path) as data:
+                yield from data['ids'].tolist()
+
+    def blocks(self):
+        if self.store is None:
+            start = 0
+            for path in self.chunks:
+                with np.load(path) as data:
+                    ids, trajectories = data['ids'].tolist(), data['trajectories']
+                yield {'start': start, 'ids': ids, 'trajectory': trajectories,
+                       'factors': None, 'restrictions': None}
+                start += len(ids)
+            return
+
+        params = self.store.params()
+        for start, stop in self.store.scenario_blocks():
+            rows = list(itertools.islice(params, stop - start))
+            yield {
+                'start': start,
+                'ids': [str(row['id']) for row in rows],
+                'trajectory': np.asarray(self.store.trajectories[start:stop], dtype=float),
+                'factors': factor_curves(self.t, [row['faks'] for row in rows]),
+                'restrictions': np.asarray(self.store.restrictions[start:stop], dtype=float),
+            }
+
+
+def batch_dir(name):
+    """Каталог пакетного расчёта внутри BATCH_ROOT (пути за его пределами запрещены)"""
+    root = os.path.realpath(BATCH_ROOT)
+    path = os.path.realpath(os.path.join(root, name or ''))
+    if path != root and not path.startswith(root + os.sep):
+        raise ValueError("Каталог должен находиться внутри каталога пакетных расчётов")
+    return path
+
+
+# ===============================
+# ТАБЛИЦЫ
+# ===============================
+
+def run_metrics(block, t):
+    data = np.asarray(block['trajectory'], dtype=float)
+    metrics = {'final': data[:, -1], 'max': np.nanmax(data, axis=1)}
+    if block['restrictions'] is not None:
+        metrics['first_breach'] = first_breach_times(t, data, block['restrictions'])
+        metrics['breaches'] = (metrics['max'] >= block['restrictions']).sum(axis=1)
+    return metrics
+
+
+def table_columns(source, table):
+    if table == 'trajectory':
+        return ['run', 'id', 't'] + VARIABLES + (FACTORS if source.has_factors else [])
+    names = ['run', 'id'] + [f'final_{v}' for v in VARIABLES] + [f'max_{v}' for v in VARIABLES]
+    if source.has_restrictions:
+        names += [f'first_breach_{v}' for v in VARIABLES] + ['breaches']
+    return names
+
+
+def table_blocks(source, table):
+    """Столбцы таблицы по блокам сценариев: словари имя -> массив"""
+    t = np.asarray(source.t, dtype=float)
+    for block in source.blocks():
+        k = len(block['ids'])
+        runs = np.arange(block['start'], block['start'] + k)
+        ids = np.array(block['ids'], dtype=object)
+        if table == 'trajectory':
+            T = len(t)
+            columns = {'run': np.repeat(runs, T), 'id': np.repeat(ids, T), 't': np.tile(t, k)}
+            for j, name in enumerate(VARIABLES):
+                columns[name] = np.asarray(block['trajectory'][:, :, j], dtype=float).ravel()
+            if block['factors'] is not None:
+                for j, name in enumerate(FACTORS):
+                    columns[name] = block['factors'][:, :, j].ravel()
+        else:
+            metrics = run_metrics(block, t)
+            columns = {'run': runs, 'id': ids}
+            for key in ('final', 'max', 'first_breach'):
+                if key in metrics:
+                    for j, name in enumerate(VARIABLES):
+                        columns[f'{key}_{name}'] = metrics[key][:, j]
+            if 'breaches' in metrics:
+                columns['breaches'] = metrics['breaches']
+        yield columns
+
+
+# ===============================
+# ЗАПИСЬ ПОТОКОМ
+# ===============================
+
+class _Sink:
+    """Файлоподобный приёмник без seek: записанное забирается по частям через take()"""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _csv_cell_lists(columns, lo, hi):
+    cells = []
+    for values in columns.values():
+        part = values[lo:hi].tolist()
+        if values.dtype.kind == 'f':
+            part = ['' if v != v else v for v in part]
+        cells.append(part)
+    return cells
+
+
+def csv_stream(source, table):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(table_columns(source, table))
+    for columns in table_blocks(source, table):
+        rows = len(columns['run'])
+        for lo in range(0, rows, CSV_ROWS):
+            writer.writerows(zip(*_csv_cell_lists(columns, lo, lo + CSV_ROWS)))
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def _npz_arrays(source):
+    """(имя, форма, тип, функция-генератор блоков) для каждого массива NPZ"""
+    n, T = source.n, len(source.t)
+    m, nv = len(FACTORS), len(VARIABLES)
+    id_len = max([len(i) for i in source.ids()] or [1])
+
+    def field(key):
+        return lambda: (block[key] for block in source.blocks())
+
+    def metric(key):
+        return lambda: (run_metrics(block, np.asarray(source.t))[key] for block in source.blocks())
+
+    arrays = [
+        ('t', (T,), np.float64, lambda: iter([source.t])),
+        ('ids', (n,), f'<U{id_len}', field('ids')),
+        ('trajectories', (n, T, nv), source.dtype, field('trajectory')),
+    ]
+    if source.has_factors:
+        arrays.append(('factors', (n, T, m), np.float64, field('factors')))
+    if source.has_restrictions:
+        arrays.append(('restrictions', (n, nv), np.float64, field('restrictions')))
+    arrays += [('final', (n, nv), np.float64, metric('final')),
+               ('max', (n, nv), np.float64, metric('max'))]
+    if source.has_restrictions:
+        arrays += [('first_breach', (n, nv), np.float64, metric('first_breach')),
+                   ('breaches', (n,), np.int64, metric('breaches'))]
+    return arrays
+
+
+def npz_stream(source):
+    """Сжатый NPZ, который np.load читает как обычный; массивы пишутся блоками"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for name, shape, dtype, chunks in _npz_arrays(source):
+            dtype = np.dtype(dtype)
+            with zf.open(name + '.npy', 'w', force_zip64=True) as f:
+                np.lib.format.write_array_header_1_0(f, {
+                    'descr': np.lib.format.dtype_to_descr(dtype),
+                    'fortran_order': False,
+                    'shape': shape,
+                })
+                for chunk in chunks():
+                    f.write(np.ascontiguousarray(np.asarray(chunk), dtype=dtype).tobytes())
+                    yield sink.take()
+    yield sink.take()
+
+
+def _arrow_schema(source, table):
+    fields = []
+    for name in table_columns(source, table):
+        if name in ('run', 'breaches'):
+            fields.append(pa.field(name, pa.int64()))
+        elif name == 'id':
+            fields.append(pa.field(name, pa.string()))
+        else:
+            fields.append(pa.field(name, pa.float64()))
+    return pa.schema(fields)
+
+
+def arrow_stream(source, table, fmt):
+    """Parquet (по группе строк на блок) или поток Arrow IPC (по пакету записей на блок)"""
+    schema = _arrow_schema(source, table)
+    sink = _Sink()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for columns in table_blocks(source, table):
+        batch = pa.record_batch([pa.array(columns[name], type=schema.field(name).type)
+                                 for name in schema.names], schema=schema)
+        if fmt == 'parquet':
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def export_stream(source, fmt='csv', table='trajectory'):
+    """Проверяет параметры и возвращает генератор байтов выгрузки"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    if fmt not in available_formats():
+        raise ValueError(f"Для формата {fmt} нужен pyarrow")
+    if table not in TABLES:
+        raise ValueError(f"Неизвестная таблица: {table}")
+    if fmt == 'csv':
+        return csv_stream(source, table)
+    if fmt == 'npz':
+        return npz_stream(source)
+    return arrow_stream(source, table, fmt)
+
+
+def download_name(base, fmt, table):
+    suffix = '' if fmt == 'npz' else f'_{table}'
+    return f'{base}{suffix}.{FORMATS[fmt][1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Выгрузка результатов пакетного расчёта")
+    parser.add_argument('input', help="каталог результатов batch.py")
+    parser.add_argument('-f', '--format', default='csv', choices=list(FORMATS))
+    parser.add_argument('-t', '--table', default='trajectory', choices=TABLES)
+    parser.add_argument('-o', '--out', required=True)
+    args = parser.parse_args()
+
+    with open(args.out, 'wb') as out:
+        for data in export_stream(BatchSource(args.input), args.format, args.table):
+            out.write(data)
@@ -0,0 +1,124 @@
+# image_formats.py
+"""Форматы изображений результатов.
+
+    png   — PNG matplotlib по умолчанию
+    png8  — PNG с палитрой до 256 цветов (графики почти целиком из плоских цветов)
+    webp  — WebP без потерь
+    svg   — SVG с упрощёнными линиями и текстом без перевода в кривые
+
+Формат задаётся переменной окружения IMAGE_FORMAT; 'auto' (по умолчанию) —
+WebP, если клиент явно указал image/webp в Accept, иначе PNG.
+"""
+import io
+import os
+import re
+import threading
+
+import matplotlib
+from matplotlib.lines import Line2D
+from PIL import Image
+
+FORMATS = {
+    'png': {'ext': 'png', 'mimetype': 'image/png'},
+    'png8': {'ext': 'png', 'mimetype': 'image/png'},
+    'webp': {'ext': 'webp', 'mimetype': 'image/webp'},
+    'svg': {'ext': 'svg', 'mimetype': 'image/svg+xml'},
+}
+
+EXTENSIONS = sorted({spec['ext'] for spec in FORMATS.values()})
+
+IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT', 'auto')
+
+# Порог упрощения линий для SVG: точки, отклоняющиеся меньше чем на долю пикселя, отбрасываются
+SVG_SIMPLIFY_THRESHOLD = 0.5
+
+# Метаданные без версии matplotlib и даты: одинаковые фигуры дают побайтно
+# одинаковые файлы (ETag, сравнение по хэшу, кэш)
+PNG_METADATA = {'Software': None}
+SVG_METADATA = {'Date': None, 'Creator': None}
+
+# svg.fonttype задаётся только через rcParams; его читает лишь SVG-вывод,
+# поэтому SVG сохраняются по одному под этой блокировкой, а остальные форматы
+# глобальные настройки не трогают
+_SVG_RC_LOCK = threading.Lock()
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат изображений: {fmt}")
+    return fmt
+
+
+def negotiate(accept_mimetypes=None, configured=None):
+    """Формат по настройке или по заголовку Accept (request.accept_mimetypes)"""
+    configured = configured or IMAGE_FORMAT
+    if configured != 'auto':
+        return check_format(configured)
+    # */* не считается: WebP выбирается, только если клиент назвал его явно
+    if accept_mimetypes is not None and any(mime == 'image/webp' for mime, q in accept_mimetypes if q > 0):
+        return 'webp'
+    return 'png'
+
+
+def extension(fmt):
+    return FORMATS[check_format(fmt)]['ext']
+
+
+def mimetype(fmt):
+    return FORMATS[check_format(fmt)]['mimetype']
+
+
+_SVG_ID = re.compile(rb'id="([a-z][0-9a-f]{10})"')
+
+
+def _stable_svg_ids(svg):
+    """Идентификаторы элементов SVG по порядку появления.
+
+    matplotlib строит их из случайной соли (svg.hashsalt) и адресов объектов
+    в памяти, поэтому они отличаются от запуска к запуску.
+    """
+    for number, svg_id in enumerate(dict.fromkeys(_SVG_ID.findall(svg))):
+        svg = svg.replace(svg_id, svg_id[:1] + b'%d' % number)
+    return svg
+
+
+def _simplify_lines(fig, threshold):
+    """Порог упрощения для линий фигуры — у их путей, а не в глобальном rcParams"""
+    for line in fig.findobj(Line2D):
+        line.get_path().simplify_threshold = threshold
+
+
+def encode(fig, fmt='png', dpi=None, tight=True, simplify_threshold=None):
+    """Сохраняет фигуру в байты в заданном формате"""
+    check_format(fmt)
+    bbox_inches = 'tight' if tight else None
+    if fmt == 'svg':
+        simplify_threshold = max(simplify_threshold or 0, SVG_SIMPLIFY_THRESHOLD)
+    if simplify_threshold is not None:
+        _simplify_lines(fig, simplify_threshold)
+
+    buf = io.BytesIO()
+    if fmt == 'svg':
+        with _SVG_RC_LOCK, matplotlib.rc_context({'svg.fonttype': 'none'}):
+            fig.savefig(buf, format='svg', bbox_inches=bbox_inches, dpi=dpi,
+                        metadata=SVG_METADATA)
+    elif fmt == 'png':
+        fig.savefig(buf, format='png', bbox_inches=bbox_inches, dpi=dpi,
+                    metadata=PNG_METADATA)
+    else:
+        # Промежуточный PNG с быстрым сжатием, затем перекодирование Pillow
+        fig.savefig(buf, format='png', bbox_inches=bbox_inches, dpi=dpi,
+                    metadata=PNG_METADATA, pil_kwargs={'compress_level': 1})
+    if fmt == 'svg':
+        return _stable_svg_ids(buf.getvalue())
+    if fmt == 'png':
+        return buf.getvalue()
+
+    buf.seek(0)
+    image = Image.open(buf)
+    out = io.BytesIO()
+    if fmt == 'png8':
+        image.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(out, format='PNG', optimize=True)
+    else:
+        image.save(out, format='WEBP', lossless=True, method=4)
+    return out.getvalue()
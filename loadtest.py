@@ -0,0 +1,347 @@
+# loadtest.py
+"""Нагрузочное тестирование приложения на локальном сервере.
+
+Пример:
+    python loadtest.py --spawn "gunicorn -w 4 -b 127.0.0.1:5000 wsgi:application" \\
+        --server-workers 4 --concurrency 8 --duration 60 -o report.json
+    python loadtest.py --compare before.json after.json
+
+Запросы выбираются случайно по весам --mix:
+    post    — POST / со случайными допустимыми для parse_form значениями
+    run     — GET /?run=1 (сценарий по умолчанию)
+    draw    — POST /draw_graphics
+    static  — страницы /, /graphic, /diagrams, /facks
+
+Отчёт (JSON) содержит пропускную способность, перцентили задержки p50/p95/p99,
+долю ошибок по каждому типу запросов и оценку загрузки рабочих процессов
+сервера; два отчёта сравниваются через --compare. Используется только
+стандартная библиотека.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+STATIC_PAGES = ['/', '/graphic', '/diagrams', '/facks']
+
+DEFAULT_MIX = 'post=3,run=2,draw=1,static=4'
+
+
+def random_inputs(rng):
+    """Случайные входы в границах parse_form; предел всегда больше начального значения"""
+    u = [round(rng.uniform(0.1, 0.85), 2) for _ in range(8)]
+    return {
+        'u': u,
+        'u_restrictions': [round(rng.uniform(x + 0.05, 1.0), 2) for x in u],
+        'faks': [[round(rng.uniform(0.0, 1.0), 2), round(rng.uniform(-0.5, 0.5), 2)] for _ in range(5)],
+        'equations': [[round(rng.uniform(-0.8, 0.8), 2), round(rng.uniform(0.1, 0.9), 2)] for _ in range(18)],
+    }
+
+
+def form_fields(inputs):
+    """Входы -> поля формы главной страницы"""
+    fields = {}
+    for i in range(8):
+        fields[f'u{i + 1}'] = inputs['u'][i]
+        fields[f'u_restrictions{i + 1}'] = inputs['u_restrictions'][i]
+    for i, (a, b) in enumerate(inputs['faks']):
+        fields[f'fak{i + 1}_a'] = a
+        fields[f'fak{i + 1}_b'] = b
+    for i, (k, b) in enumerate(inputs['equations']):
+        fields[f'f{i + 1}_k'] = k
+        fields[f'f{i + 1}_b'] = b
+    return fields
+
+
+def build_request(kind, base_url, rng):
+    """(метод, путь, тело, заголовки) для запроса данного типа"""
+    if kind == 'post':
+        body = urllib.parse.urlencode(form_fields(random_inputs(rng))).encode('ascii')
+        return 'POST', '/', body, {'Content-Type': 'application/x-www-form-urlencoded'}
+    if kind == 'run':
+        return 'GET', '/?run=1', None, {}
+    if kind == 'draw':
+        inputs = random_inputs(rng)
+        body = json.dumps({
+            'initial_equations': inputs['u'],
+            'faks': inputs['faks'],
+            'equations': inputs['equations'],
+            'restrictions': inputs['u_restrictions'],
+        }).encode('utf-8')
+        return 'POST', '/draw_graphics', body, {'Content-Type': 'application/json'}
+    if kind == 'static':
+        return 'GET', rng.choice(STATIC_PAGES), None, {}
+    raise ValueError(f"Неизвестный тип запроса: {kind}")
+
+
+def send(base_url, method, path, body, headers, timeout):
+    """Выполняет запрос; возвращает (задержка в секундах, текст ошибки или None)"""
+    request = urllib.request.Request(base_url + path, data=body, headers=headers, method=method)
+    started = time.perf_counter()
+    error = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = response.read()
+            if response.headers.get_content_type() == 'application/json':
+                # JSON-маршруты сообщают об ошибке в теле ответа с кодом 200
+                status = json.loads(payload).get('status')
+                if status != 'Выполнено':
+                    error = f"status={status}"
+            elif b'alert-danger' in payload:
+                # Главная страница показывает ошибку расчёта в блоке alert-danger
+                match = re.search(r'</strong>\s*([^<]{0,80})', payload.decode('utf-8', 'replace'))
+                error = 'page: ' + (match.group(1).strip() if match else 'error')
+    except urllib.error.HTTPError as exc:
+        error = f"HTTP {exc.code}"
+    except Exception as exc:
+        error = type(exc).__name__
+    return time.perf_counter() - started, error
+
+
+def percentile(sorted_values, q):
+    """Перцентиль по методу ближайшего ранга"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def latency_stats(latencies, errors, elapsed):
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'throughput': round(count / elapsed, 3) if elapsed else 0.0,
+        'mean_ms': round(sum(values) / count * 1000, 1) if count else None,
+        'p50_ms': round(percentile(values, 50) * 1000, 1) if count else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 1) if count else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 1) if count else None,
+        'max_ms': round(values[-1] * 1000, 1) if count else None,
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, weight = part.split('=')
+        mix[kind.strip()] = float(weight)
+    for kind in mix:
+        build_request(kind, '', random.Random(0))
+    return mix
+
+
+def baseline(base_url, kinds, repeats, timeout, seed):
+    """Время обслуживания каждого типа запросов без конкуренции (медиана из repeats)"""
+    rng = random.Random(seed)
+    service = {}
+    for kind in kinds:
+        latencies = []
+        for _ in range(repeats):
+            latency, error = send(base_url, *build_request(kind, base_url, rng), timeout)
+            if error is None:
+                latencies.append(latency)
+        service[kind] = percentile(sorted(latencies), 50)
+    return service
+
+
+def run_load(base_url, mix, concurrency, duration=None, total=None, timeout=120, seed=0):
+    """Нагрузка из concurrency потоков; останавливается по времени или числу запросов"""
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    results = {k: {'latencies': [], 'errors': 0, 'messages': {}} for k in kinds}
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def take():
+        with lock:
+            if total is not None and issued[0] >= total:
+                return False
+            issued[0] += 1
+            return True
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        while (deadline is None or time.perf_counter() < deadline) and take():
+            kind = rng.choices(kinds, weights)[0]
+            latency, error = send(base_url, *build_request(kind, base_url, rng), timeout)
+            with lock:
+                entry = results[kind]
+                entry['latencies'].append(latency)
+                if error is not None:
+                    entry['errors'] += 1
+                    entry['messages'][error] = entry['messages'].get(error, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    return results, time.perf_counter() - started
+
+
+def saturation(results, elapsed, service, server_workers):
+    """Оценка загрузки сервера по закону Литтла.
+
+    busy — среднее число запросов, которые сервер обслуживал одновременно,
+    если бы каждый занимал рабочий процесс на время обслуживания без очереди
+    (baseline); queueing — во сколько раз задержка под нагрузкой больше.
+    """
+    busy = sum(len(r['latencies']) * (service.get(k) or 0) for k, r in results.items()) / elapsed
+    in_flight = sum(sum(r['latencies']) for r in results.values()) / elapsed
+    report = {
+        'in_flight': round(in_flight, 2),
+        'busy_workers': round(busy, 2),
+        'queueing_factor': round(in_flight / busy, 2) if busy else None,
+    }
+    if server_workers:
+        report['server_workers'] = server_workers
+        report['utilization'] = round(busy / server_workers, 3)
+    return report
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def wait_ready(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/graphic', timeout=5):
+                return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"Сервер {base_url} не ответил за {timeout} с")
+
+
+def make_report(args, mix, results, elapsed, service):
+    all_latencies = [v for r in results.values() for v in r['latencies']]
+    all_errors = sum(r['errors'] for r in results.values())
+    return {
+        'revision': git_revision(),
+        'label': args.label,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'url': args.url,
+            'server': args.spawn,
+            'server_workers': args.server_workers,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'requests': args.requests,
+            'mix': mix,
+            'seed': args.seed,
+        },
+        'elapsed': round(elapsed, 3),
+        'total': latency_stats(all_latencies, all_errors, elapsed),
+        'endpoints': {
+            kind: dict(latency_stats(r['latencies'], r['errors'], elapsed),
+                       baseline_ms=round(service[kind] * 1000, 1) if service.get(kind) else None,
+                       error_messages=r['messages'])
+            for kind, r in results.items()
+        },
+        'saturation': saturation(results, elapsed, service, args.server_workers),
+    }
+
+
+def print_report(report, out=sys.stdout):
+    config = report['config']
+    print(f"{report['label'] or report['revision']}: {config['concurrency']} потоков, "
+          f"{report['elapsed']:.1f} с", file=out)
+    print(f"{'':8} {'запр.':>7} {'ошиб.':>6} {'зап/с':>8} {'p50':>8} {'p95':>8} {'p99':>8}", file=out)
+    rows = list(report['endpoints'].items()) + [('всего', report['total'])]
+    for kind, s in rows:
+        print(f"{kind:8} {s['requests']:>7} {s['error_rate']:>6.1%} {s['throughput']:>8.2f} "
+              f"{s['p50_ms'] or 0:>8.0f} {s['p95_ms'] or 0:>8.0f} {s['p99_ms'] or 0:>8.0f}", file=out)
+    sat = report['saturation']
+    line = f"в обработке {sat['in_flight']}, занято процессов {sat['busy_workers']}"
+    if 'utilization' in sat:
+        line += f" из {sat['server_workers']} ({sat['utilization']:.0%})"
+    print(line + f", рост задержки из-за очереди x{sat['queueing_factor']}", file=out)
+
+
+def compare(old, new, out=sys.stdout):
+    """Изменение показателей между двумя отчётами"""
+    print(f"{old['label'] or old['revision']} -> {new['label'] or new['revision']}", file=out)
+    metrics = ['throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate']
+    print(f"{'':8} " + ' '.join(f"{m:>24}" for m in metrics), file=out)
+    kinds = [k for k in new['endpoints'] if k in old['endpoints']]
+    for kind in kinds + ['всего']:
+        a = old['total'] if kind == 'всего' else old['endpoints'][kind]
+        b = new['total'] if kind == 'всего' else new['endpoints'][kind]
+        cells = []
+        for m in metrics:
+            if a[m] is None or b[m] is None:
+                cells.append('—')
+                continue
+            change = f" ({(b[m] - a[m]) / a[m]:+.0%})" if a[m] else ''
+            cells.append(f"{a[m]:.4g} -> {b[m]:.4g}{change}")
+        print(f"{kind:8} " + ' '.join(f"{c:>24}" for c in cells), file=out)
+    a, b = old['saturation'], new['saturation']
+    print(f"занято процессов {a['busy_workers']} -> {b['busy_workers']}, "
+          f"рост задержки из-за очереди x{a['queueing_factor']} -> x{b['queueing_factor']}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование приложения")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="адрес запущенного сервера")
+    parser.add_argument('--spawn', default=None, help="команда запуска сервера (останавливается после теста)")
+    parser.add_argument('--server-workers', type=int, default=None, help="число рабочих процессов сервера (для оценки загрузки)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="число одновременных клиентов")
+    parser.add_argument('-d', '--duration', type=float, default=30, help="длительность, с")
+    parser.add_argument('-n', '--requests', type=int, default=None, help="число запросов (вместо длительности)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="веса типов запросов")
+    parser.add_argument('--baseline-repeats', type=int, default=3, help="запросов каждого типа для замера без нагрузки")
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', default=None, help="подпись отчёта (например, конфигурация сервера)")
+    parser.add_argument('-o', '--out', default=None, help="JSON-файл отчёта")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="сравнить два отчёта и выйти")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, 'r', encoding='utf-8') as f:
+                reports.append(json.load(f))
+        compare(*reports)
+        return
+
+    mix = parse_mix(args.mix)
+    base_url = args.url.rstrip('/')
+    server = subprocess.Popen(shlex.split(args.spawn)) if args.spawn else None
+    try:
+        wait_ready(base_url)
+        service = baseline(base_url, list(mix), args.baseline_repeats, args.timeout, args.seed)
+        results, elapsed = run_load(base_url, mix, args.concurrency,
+                                    duration=None if args.requests else args.duration,
+                                    total=args.requests, timeout=args.timeout, seed=args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = make_report(args, mix, results, elapsed, service)
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
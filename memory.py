@@ -0,0 +1,196 @@
+# memory.py
+"""Учёт памяти рабочего процесса.
+
+    stage(name)     — контекстный менеджер: прирост и пик памяти Python
+                      (tracemalloc) на этапе обработки запроса
+    register_cache  — кэши модулей, которые можно очистить при нехватке памяти
+    check_budget()  — сравнивает RSS с бюджетом MEMORY_BUDGET_MB: сначала
+                      очищает кэши, а если это не помогло — просит перезапустить
+                      процесс (под gunicorn процесс завершается мягко после
+                      текущего запроса, мастер поднимает новый)
+
+tracemalloc включается переменной MEMORY_TRACE=1 или через POST /memory;
+без него этапы учитывают только время и RSS.
+"""
+import gc
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+# Бюджет памяти процесса, МБ (0 — без ограничения)
+MEMORY_BUDGET_MB = float(os.environ.get('MEMORY_BUDGET_MB', 0))
+
+# Как часто проверять бюджет, не чаще раза в столько секунд
+CHECK_INTERVAL = 5.0
+
+_lock = threading.Lock()
+_caches = {}
+_stages = {}
+_last_snapshot = None
+_state = {'trims': 0, 'recycle_requested': False, 'last_check': 0.0}
+
+
+def rss_bytes():
+    """Текущий RSS процесса; если /proc недоступен — пиковый RSS"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # В macOS ru_maxrss в байтах, в Linux — в килобайтах
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def live_figures():
+    from utils import live_figure_count
+    return live_figure_count()
+
+
+def register_cache(name, size, trim):
+    """size() — число записей (или байт), trim() — очистка кэша"""
+    _caches[name] = (size, trim)
+
+
+def cache_sizes():
+    return {name: size() for name, (size, _) in _caches.items()}
+
+
+def trim_caches():
+    """Очищает все зарегистрированные кэши и собирает мусор; возвращает освобождённый RSS"""
+    before = rss_bytes()
+    for _, trim in _caches.values():
+        trim()
+    gc.collect()
+    with _lock:
+        _state['trims'] += 1
+    return before - rss_bytes()
+
+
+class stage:
+    """Учёт этапа: вызовы, время, прирост и пик памяти Python (при включённом tracemalloc).
+
+    Пик сбрасывается глобально, поэтому при одновременных запросах значения
+    приблизительные.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.tracing = tracemalloc.is_tracing()
+        if self.tracing:
+            self.current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        with _lock:
+            entry = _stages.setdefault(self.name, {'calls': 0, 'seconds': 0.0,
+                                                   'retained_bytes': 0, 'max_peak_bytes': 0})
+            entry['calls'] += 1
+            entry['seconds'] += elapsed
+            if self.tracing and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                entry['retained_bytes'] += current - self.current
+                entry['max_peak_bytes'] = max(entry['max_peak_bytes'], peak - self.current)
+        return False
+
+
+def start_tracing(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+
+
+def top_allocations(limit=10):
+    """Крупнейшие места выделения памяти и прирост с прошлого вызова (по строкам кода)"""
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    top = [{'where': str(s.traceback[0]), 'bytes': s.size, 'count': s.count}
+           for s in snapshot.statistics('lineno')[:limit]]
+    growth = None
+    if _last_snapshot is not None:
+        growth = [{'where': str(s.traceback[0]), 'bytes': s.size_diff, 'count': s.count_diff}
+                  for s in snapshot.compare_to(_last_snapshot, 'lineno')[:limit]]
+    _last_snapshot = snapshot
+    return {'top': top, 'growth': growth}
+
+
+def check_budget(force=False):
+    """Проверяет бюджет; при превышении очищает кэши, а если не помогло — просит перезапуск.
+
+    Возвращает True, если процессу нужно перезапуститься.
+    """
+    if not MEMORY_BUDGET_MB:
+        return False
+    now = time.monotonic()
+    with _lock:
+        if _state['recycle_requested']:
+            return True
+        if not force and now - _state['last_check'] < CHECK_INTERVAL:
+            return False
+        _state['last_check'] = now
+
+    budget = MEMORY_BUDGET_MB * 1024 * 1024
+    if rss_bytes() <= budget:
+        return False
+    trim_caches()
+    if rss_bytes() <= budget:
+        return False
+
+    with _lock:
+        first = not _state['recycle_requested']
+        _state['recycle_requested'] = True
+    if first:
+        print(f"Память процесса {os.getpid()} выше бюджета {MEMORY_BUDGET_MB:.0f} МБ "
+              f"после очистки кэшей, нужен перезапуск")
+        request_recycle()
+    return True
+
+
+def request_recycle():
+    """Под gunicorn SIGTERM рабочему процессу — мягкое завершение после текущего запроса"""
+    if 'gunicorn' in sys.modules:
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def report(top=0):
+    rss = rss_bytes()
+    result = {
+        'pid': os.getpid(),
+        'rss_mb': round(rss / 1024 / 1024, 1),
+        'budget_mb': MEMORY_BUDGET_MB or None,
+        'live_figures': live_figures(),
+        'caches': cache_sizes(),
+        'trims': _state['trims'],
+        'recycle_requested': _state['recycle_requested'],
+        'tracing': tracemalloc.is_tracing(),
+        'stages': {name: dict(entry, seconds=round(entry['seconds'], 3))
+                   for name, entry in _stages.items()},
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        result['traced_mb'] = round(current / 1024 / 1024, 2)
+        if top:
+            result['allocations'] = top_allocations(top)
+    return result
+
+
+if os.environ.get('MEMORY_TRACE') == '1':
+    start_tracing()
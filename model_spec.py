@@ -0,0 +1,598 @@
+# model_spec.py
+"""Декларативное описание модели влияния и её компиляция в разреженную систему ОДУ.
+
+Спецификация — обычный словарь (его можно хранить в JSON):
+
+    variables  — имена характеристик Xi
+    factors    — внешние возмущения F(t) = clip(a + b*t, *bounds)
+    transfers  — функции влияния f(x) = clip(k*x + b, *transfer_bounds);
+                 'argument' — характеристика, от которой функция зависит
+    edges      — рёбра графа: target <- weight * source, где source —
+                 характеристика или возмущение; ребро с 'transfer'
+                 пропускает source через соответствующую функцию f
+    rate_bounds — ограничение на производную каждой характеристики
+
+По умолчанию решает LSODA: в нежёстком режиме (Адамс) он якобиан не строит,
+и стоимость шага пропорциональна числу рёбер. Жёсткие модели от
+SPARSE_MIN_VARIABLES характеристик решаются BDF с аналитическим разреженным
+якобианом — LSODA в жёстком режиме оценивает плотный якобиан n×n.
+
+    python model_spec.py   — сверить DEFAULT_SPEC с functions.pend
+"""
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+from scipy import sparse
+from scipy.integrate import odeint, solve_ivp
+
+# ODEPACK (odeint и LSODA в solve_ivp) хранит состояние в глобальных переменных
+# Fortran и не допускает одновременных решений из разных потоков
+_ODEPACK_LOCK = threading.Lock()
+
+
+# Начиная с этого числа характеристик жёсткие модели решаются BDF с разреженным
+# якобианом (см. CompiledModel.default_method)
+SPARSE_MIN_VARIABLES = 64
+# Модель считается жёсткой, если наибольшая скорость собственного затухания,
+# умноженная на длину интервала, не меньше этого значения
+STIFF_RATE = 100.0
+
+
+class SolverTimeout(RuntimeError):
+    """Решатель не уложился в отведённое время (см. deadline в integrate_events)"""
+
+DEFAULT_SPEC = {
+    'name': 'aviation',
+    'variables': ['X1', 'X2', 'X3', 'X4', 'X5', 'X6', 'X7', 'X8'],
+    'factors': [
+        {'name': 'F1', 'bounds': [0.1, 1.0]},  # обучение / подготовка пилотов
+        {'name': 'F2', 'bounds': [0.1, 1.0]},  # рост частной авиации
+        {'name': 'F3', 'bounds': [0.1, 1.0]},  # усиление контроля
+        {'name': 'F4', 'bounds': [0.1, 1.0]},  # развитие метеослужб
+        {'name': 'F5', 'bounds': [0.1, 1.0]},  # общий уровень безопасности
+    ],
+    'transfers': [
+        {'name': 'f1', 'argument': 'X2'},
+        {'name': 'f2', 'argument': 'X3'},
+        {'name': 'f3', 'argument': 'X4'},
+        {'name': 'f4', 'argument': 'X4'},
+        {'name': 'f5', 'argument': 'X6'},
+        {'name': 'f6', 'argument': 'X7'},
+        {'name': 'f7', 'argument': 'X8'},
+        {'name': 'f8', 'argument': 'X7'},
+        {'name': 'f9', 'argument': 'X1'},
+        {'name': 'f10', 'argument': 'X2'},
+        {'name': 'f11', 'argument': 'X7'},
+        {'name': 'f12', 'argument': 'X1'},
+        {'name': 'f13', 'argument': 'X2'},
+        {'name': 'f14', 'argument': 'X2'},
+        {'name': 'f15', 'argument': 'X2'},
+        {'name': 'f16', 'argument': 'X3'},
+        {'name': 'f17', 'argument': 'X4'},
+        {'name': 'f18', 'argument': 'X2'},
+    ],
+    'transfer_bounds': [0.05, 0.95],
+    'rate_bounds': [-0.5, 0.5],
+    'edges': [
+        # X1 — нарушения пилотами (должны уменьшаться)
+        {'target': 'X1', 'source': 'F1', 'weight': -0.6},
+        # в functions.pend f1 вычисляется от X3, сохраняем это поведение
+        {'target': 'X1', 'source': 'X3', 'weight': -0.4, 'transfer': 'f1'},
+        # X2 — доля частных судов (растёт)
+        {'target': 'X2', 'source': 'F2', 'weight': 0.5},
+        {'target': 'X2', 'source': 'X2', 'weight': -0.2},
+        # X3 — активность контроля (растёт)
+        {'target': 'X3', 'source': 'F3', 'weight': 0.6},
+        {'target': 'X3', 'source': 'X3', 'weight': -0.3},
+        # X4 — метеослужбы (растут)
+        {'target': 'X4', 'source': 'F4', 'weight': 0.6},
+        {'target': 'X4', 'source': 'X4', 'weight': -0.3},
+        # X5 — метеоусловия (уменьшаются при росте X4)
+        {'target': 'X5', 'source': 'X1', 'weight': 0.5},
+        {'target': 'X5', 'source': 'X4', 'weight': -0.7},
+        {'target': 'X5', 'source': 'X5', 'weight': -0.2},
+        # X6 — технические неисправности (уменьшаются при росте контроля)
+        {'target': 'X6', 'source': 'X2', 'weight': 0.4},
+        {'target': 'X6', 'source': 'X3', 'weight': -0.7},
+        {'target': 'X6', 'source': 'X6', 'weight': -0.2},
+        # X7 — человеческий фактор (уменьшается при снижении X1)
+        {'target': 'X7', 'source': 'X1', 'weight': 0.6},
+        {'target': 'X7', 'source': 'X3', 'weight': -0.6},
+        {'target': 'X7', 'source': 'X7', 'weight': -0.2},
+        # X8 — общее число катастроф
+        {'target': 'X8', 'source': 'X8', 'weight': -0.6},
+    ],
+}
+
+
+def smooth_clip(x, lo, hi, sharpness):
+    """Гладкое ограничение: lo + softplus(x - lo) - softplus(x - hi).
+
+    softplus(y) = log(1 + exp(s·y)) / s. При росте sharpness (s) функция
+    сходится к np.clip(x, lo, hi); отклонение не больше log(2) / s.
+    """
+    s = float(sharpness)
+    result = np.asarray(x, dtype=float)
+    if np.isfinite(lo).all():
+        result = lo + np.logaddexp(0.0, s * (result - lo)) / s
+    if np.isfinite(hi).all():
+        result = hi - np.logaddexp(0.0, s * (hi - result)) / s
+    return result
+
+
+def load_spec(path):
+    """Читает спецификацию модели из JSON-файла"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_model(path):
+    """Спецификация из JSON-файла, скомпилированная в CompiledModel"""
+    return CompiledModel(load_spec(path))
+
+
+class CompiledModel:
+    """Модель, скомпилированная в разреженные матрицы.
+
+    dX/dt = clip(A·X + B·F(t) + C·f(X), *rate_bounds)
+
+    A — прямые связи между характеристиками, B — влияние возмущений,
+    C — влияние функций f, каждая из которых зависит от одной характеристики.
+    Стоимость правой части и якобиана пропорциональна числу рёбер.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.variables = list(spec['variables'])
+        self.factors = [fac['name'] for fac in spec.get('factors', [])]
+        self.transfers = [tr['name'] for tr in spec.get('transfers', [])]
+
+        var_index = {name: i for i, name in enumerate(self.variables)}
+        factor_index = {name: i for i, name in enumerate(self.factors)}
+        transfer_index = {name: i for i, name in enumerate(self.transfers)}
+        if len(var_index) != len(self.variables):
+            raise ValueError("Имена характеристик в спецификации должны быть уникальны")
+
+        self.n = len(self.variables)
+        self.m = len(self.factors)
+
+        bounds = [fac.get('bounds', [0.1, 1.0]) for fac in spec.get('factors', [])]
+        self.factor_lo = np.array([b[0] for b in bounds], dtype=float)
+        self.factor_hi = np.array([b[1] for b in bounds], dtype=float)
+        self.transfer_lo, self.transfer_hi = spec.get('transfer_bounds', [0.05, 0.95])
+        self.rate_lo, self.rate_hi = spec.get('rate_bounds', [-np.inf, np.inf])
+
+        self.transfer_argument = np.array(
+            [var_index[tr['argument']] for tr in spec.get('transfers', [])], dtype=int)
+
+        a_rows, a_cols, a_vals = [], [], []
+        b_rows, b_cols, b_vals = [], [], []
+        c_rows, c_vals, tr_src, tr_param = [], [], [], []
+
+        for edge in spec['edges']:
+            target = edge['target']
+            source = edge['source']
+            weight = float(edge['weight'])
+            if target not in var_index:
+                raise ValueError(f"Неизвестная характеристика в ребре: {target}")
+            row = var_index[target]
+
+            if 'transfer' in edge:
+                if edge['transfer'] not in transfer_index:
+                    raise ValueError(f"Неизвестная функция влияния: {edge['transfer']}")
+                if source not in var_index:
+                    raise ValueError(f"Аргументом функции влияния должна быть характеристика: {source}")
+                c_rows.append(row)
+                c_vals.append(weight)
+                tr_src.append(var_index[source])
+                tr_param.append(transfer_index[edge['transfer']])
+            elif source in var_index:
+                a_rows.append(row)
+                a_cols.append(var_index[source])
+                a_vals.append(weight)
+            elif source in factor_index:
+                b_rows.append(row)
+                b_cols.append(factor_index[source])
+                b_vals.append(weight)
+            else:
+                raise ValueError(f"Неизвестный источник в ребре: {source}")
+
+        n_tr = len(c_rows)
+        self.A = sparse.csr_matrix((a_vals, (a_rows, a_cols)), shape=(self.n, self.n))
+        self.B = sparse.csr_matrix((b_vals, (b_rows, b_cols)), shape=(self.n, self.m))
+        self.C = sparse.csr_matrix((c_vals, (c_rows, list(range(n_tr)))), shape=(self.n, n_tr))
+        self.tr_src = np.array(tr_src, dtype=int)
+        self.tr_param = np.array(tr_param, dtype=int)
+        # S выбирает аргументы функций влияния: (S·X)[e] = X[tr_src[e]]
+        self.S = sparse.csr_matrix(
+            (np.ones(n_tr), (np.arange(n_tr), self.tr_src)), shape=(n_tr, self.n))
+
+        pattern = (abs(self.A) + abs(self.C) @ self.S).tocsr()
+        pattern.data[:] = 1
+        self.jac_sparsity = pattern
+        # Наибольшая скорость собственного затухания — грубая оценка жёсткости
+        self.fastest_rate = float(abs(self.A.diagonal()).max()) if self.n else 0.0
+
+    @property
+    def n_edges(self):
+        return self.A.nnz + self.B.nnz + self.C.nnz
+
+    def _params(self, factors, transfers):
+        factors = np.asarray(factors, dtype=float).reshape(self.m, 2)
+        if len(self.transfers):
+            transfers = np.asarray(transfers, dtype=float).reshape(-1, 2)[:len(self.transfers)]
+            k = transfers[self.tr_param, 0]
+            b = transfers[self.tr_param, 1]
+        else:
+            k = b = np.zeros(0)
+        return factors[:, 0], factors[:, 1], k, b
+
+    def make_rhs(self, factors, transfers, sharpness=None):
+        """Возвращает правую часть rhs(t, x) для заданных параметров.
+
+        sharpness — резкость гладкого ограничения (smooth_clip) вместо np.clip;
+        None — прежнее жёсткое ограничение.
+        """
+        fa, fb, k, b = self._params(factors, transfers)
+        A, B, C, src = self.A, self.B, self.C, self.tr_src
+        flo, fhi = self.factor_lo, self.factor_hi
+        tlo, thi = self.transfer_lo, self.transfer_hi
+        rlo, rhi = self.rate_lo, self.rate_hi
+
+        if sharpness is None:
+            clip = np.clip
+        else:
+            def clip(x, lo, hi):
+                return smooth_clip(x, lo, hi, sharpness)
+
+        def rhs(t, x):
+            F = clip(fa + fb * t, flo, fhi)
+            z = clip(k * x[src] + b, tlo, thi)
+            return clip(A @ x + B @ F + C @ z, rlo, rhi)
+
+        return rhs
+
+    def default_method(self, span=1.0):
+        """Решатель для интервала длины span: BDF для больших жёстких моделей, иначе LSODA"""
+        if self.n >= SPARSE_MIN_VARIABLES and self.fastest_rate * span >= STIFF_RATE:
+            return 'BDF'
+        return 'LSODA'
+
+    def make_jac(self, factors, transfers):
+        """Якобиан правой части по состоянию jac(t, x) — разреженная матрица n×n.
+
+        Там, где срабатывает ограничение (clip), производная равна нулю.
+        """
+        fa, fb, k, b = self._params(factors, transfers)
+        A, B, C, S, src = self.A, self.B, self.C, self.S, self.tr_src
+
+        def jac(t, x):
+            F = np.clip(fa + fb * t, self.factor_lo, self.factor_hi)
+            z_raw = k * x[src] + b
+            z = np.clip(z_raw, self.transfer_lo, self.transfer_hi)
+            z_active = ((z_raw > self.transfer_lo) & (z_raw < self.transfer_hi)).astype(float)
+            total = A @ x + B @ F + C @ z
+            r_active = ((total > self.rate_lo) & (total < self.rate_hi)).astype(float)
+            return (sparse.diags(r_active) @ (A + C @ sparse.diags(z_active * k) @ S)).tocsc()
+
+        return jac
+
+    def _jacobian_options(self, method, factors, transfers, sharpness, options):
+        """Якобиан для неявных методов: аналитический при жёстком ограничении,
+        иначе — конечные разности по структуре jac_sparsity"""
+        if method in ('BDF', 'Radau') and 'jac' not in options:
+            if sharpness is None:
+                options['jac'] = self.make_jac(factors, transfers)
+            else:
+                options.setdefault('jac_sparsity', self.jac_sparsity)
+
+    @property
+    def n_params(self):
+        """Число параметров: коэффициенты возмущений (a, b) и функций влияния (k, b)"""
+        return 2 * self.m + 2 * len(self.transfers)
+
+    def jacobians(self, t, x, factors, transfers):
+        """Якобианы правой части по состоянию (разреженный n×n) и по параметрам (n×n_params).
+
+        Параметры упорядочены как [a1, b1, ..., am, bm, k1, b1, ..., kq, bq].
+        Там, где срабатывает ограничение (clip), производная равна нулю.
+        """
+        fa, fb, k, b = self._params(factors, transfers)
+        src = self.tr_src
+
+        f_raw = fa + fb * t
+        F = np.clip(f_raw, self.factor_lo, self.factor_hi)
+        f_active = ((f_raw > self.factor_lo) & (f_raw < self.factor_hi)).astype(float)
+
+        z_raw = k * x[src] + b
+        z = np.clip(z_raw, self.transfer_lo, self.transfer_hi)
+        z_active = ((z_raw > self.transfer_lo) & (z_raw < self.transfer_hi)).astype(float)
+
+        total = self.A @ x + self.B @ F + self.C @ z
+        r_active = ((total > self.rate_lo) & (total < self.rate_hi)).astype(float)
+
+        jac_x = self.make_jac(factors, transfers)(t, x)
+
+        jac_p = np.zeros((self.n, self.n_params))
+        jac_p[:, 0:2 * self.m:2] = (self.B @ sparse.diags(f_active)).toarray()
+        jac_p[:, 1:2 * self.m:2] = (self.B @ sparse.diags(f_active * t)).toarray()
+        if len(src):
+            dk = (self.C @ sparse.diags(z_active * x[src])).toarray()
+            db = (self.C @ sparse.diags(z_active)).toarray()
+            offset = 2 * self.m
+            # Одна функция f может входить в несколько рёбер — вклады суммируются
+            np.add.at(jac_p.T, offset + 2 * self.tr_param, dk.T)
+            np.add.at(jac_p.T, offset + 2 * self.tr_param + 1, db.T)
+        jac_p *= r_active[:, None]
+        return jac_x, jac_p
+
+    def sensitivities(self, y0, t, factors, transfers, y0_grad=None):
+        """Прямой анализ чувствительности: одно совместное решение для X и dX/dp.
+
+        S' = Jx·S + Jp,  S(0) = dX(0)/dp.  Параметры — начальные значения
+        (первые n столбцов), затем параметры из jacobians().
+        y0_grad — производные начального состояния по начальным значениям
+        (по умолчанию единичная матрица).
+        Возвращает (X формы (T, n), S формы (T, n, n + n_params)).
+        """
+        n, P = self.n, self.n + self.n_params
+        s0 = np.zeros((n, P))
+        s0[:, :n] = np.eye(n) if y0_grad is None else y0_grad
+        rhs = self.make_rhs(factors, transfers)
+
+        def augmented(t_, state):
+            x = state[:n]
+            S = state[n:].reshape(n, P)
+            jac_x, jac_p = self.jacobians(t_, x, factors, transfers)
+            dS = jac_x @ S
+            dS[:, n:] += jac_p
+            return np.concatenate([rhs(t_, x), dS.ravel()])
+
+        state0 = np.concatenate([np.asarray(y0, dtype=float), s0.ravel()])
+        with _ODEPACK_LOCK:
+            sol = odeint(augmented, state0, np.asarray(t, dtype=float), tfirst=True)
+        return sol[:, :n], sol[:, n:].reshape(len(t), n, P)
+
+    def make_batch_rhs(self, factors, transfers):
+        """Правая часть для пакета сценариев: rhs(t, X) с X формы (N, n).
+
+        factors — (N, m, 2), transfers — (N, q, 2): у каждого сценария свои параметры.
+        """
+        factors = np.asarray(factors, dtype=float).reshape(-1, self.m, 2)
+        fa, fb = factors[:, :, 0], factors[:, :, 1]
+        if len(self.transfers):
+            transfers = np.asarray(transfers, dtype=float).reshape(len(factors), -1, 2)
+            k = transfers[:, self.tr_param, 0]
+            b = transfers[:, self.tr_param, 1]
+        else:
+            k = b = np.zeros((len(factors), 0))
+        A, B, C, src = self.A, self.B, self.C, self.tr_src
+
+        def rhs(t, X):
+            F = np.clip(fa + fb * t, self.factor_lo, self.factor_hi)
+            z = np.clip(k * X[:, src] + b, self.transfer_lo, self.transfer_hi)
+            total = (A @ X.T + B @ F.T + C @ z.T).T
+            return np.clip(total, self.rate_lo, self.rate_hi)
+
+        return rhs
+
+    def integrate_batch(self, y0, t, factors, transfers, substeps=4):
+        """Векторизованное решение для пакета сценариев методом Рунге-Кутты 4-го порядка.
+
+        y0 — (N, n); шаг постоянный: substeps шагов между соседними точками t.
+        Возвращает массив формы (N, len(t), n).
+        """
+        t = np.asarray(t, dtype=float)
+        rhs = self.make_batch_rhs(factors, transfers)
+        X = np.array(y0, dtype=float)
+        out = np.empty((len(X), len(t), self.n))
+        out[:, 0] = X
+        for i in range(1, len(t)):
+            h = (t[i] - t[i - 1]) / substeps
+            tau = t[i - 1]
+            for _ in range(substeps):
+                k1 = rhs(tau, X)
+                k2 = rhs(tau + h / 2, X + h / 2 * k1)
+                k3 = rhs(tau + h / 2, X + h / 2 * k2)
+                k4 = rhs(tau + h, X + h * k3)
+                X = X + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+                tau += h
+            out[:, i] = X
+        return out
+
+    def factor_values(self, t, factors):
+        """Значения возмущений F(t) для массива моментов времени, форма (len(t), m)"""
+        fa, fb, _, _ = self._params(factors, [])
+        t = np.asarray(t, dtype=float)[:, None]
+        return np.clip(fa + fb * t, self.factor_lo, self.factor_hi)
+
+    def pend(self, u, t, factors, f):
+        """Совместимая с odeint сигнатура, как у functions.pend"""
+        return self.make_rhs(factors, f)(t, np.asarray(u, dtype=float))
+
+    def odeint(self, y0, t, factors, transfers):
+        """Решение через odeint (LSODA); для больших жёстких моделей — integrate (BDF).
+
+        Возвращает массив формы (len(t), n).
+        """
+        if self.default_method(t[-1] - t[0]) != 'LSODA':
+            return self.integrate(y0, t, factors, transfers)
+        rhs = self.make_rhs(factors, transfers)
+        with _ODEPACK_LOCK:
+            return odeint(rhs, np.asarray(y0, dtype=float), t, tfirst=True)
+
+    def integrate(self, y0, t, factors, transfers, method=None, **options):
+        """Решение через solve_ivp; method=None — default_method().
+
+        Для неявных методов (BDF, Radau) передаётся разреженный якобиан
+        (см. make_jac), поэтому стоимость шага зависит от числа рёбер, а не от n².
+        Возвращает массив формы (len(t), n), как odeint.
+        """
+        t = np.asarray(t, dtype=float)
+        method = method or self.default_method(t[-1] - t[0])
+        rhs = self.make_rhs(factors, transfers)
+        options.setdefault('rtol', 1.49012e-8)
+        options.setdefault('atol', 1.49012e-8)
+        self._jacobian_options(method, factors, transfers, None, options)
+        with _ODEPACK_LOCK if method == 'LSODA' else nullcontext():
+            sol = solve_ivp(rhs, (t[0], t[-1]), np.asarray(y0, dtype=float),
+                            method=method, t_eval=t, **options)
+        if not sol.success:
+            raise RuntimeError(f"Ошибка интегрирования: {sol.message}")
+        return sol.y.T
+
+    def integrate_events(self, y0, t, factors, transfers, levels, stop_on_breach=False,
+                         method=None, sharpness=None, stats=None, time_limit=None, **options):
+        """Решение с точным поиском моментов пересечения уровней.
+
+        levels — список (индекс характеристики, уровень, вид); вид 'restriction'
+        означает предельное значение, остальные — пользовательские пороги.
+        При stop_on_breach расчёт останавливается на первом пересечении
+        предельного значения снизу вверх.
+        method=None — default_method(): LSODA или, для больших жёстких моделей,
+        BDF с разреженным якобианом.
+        sharpness — гладкое ограничение вместо жёсткого (см. make_rhs).
+        Если передан словарь stats, в него записываются число шагов решателя
+        и вычислений правой части и якобиана.
+        time_limit — предел времени решения, с: после него решение прерывается
+        исключением SolverTimeout. Отсчёт идёт с момента, когда решатель
+        начал работу (ожидание _ODEPACK_LOCK не считается).
+        Возвращает (t, решение формы (len(t), n), список пересечений).
+        """
+        t = np.asarray(t, dtype=float)
+        method = method or self.default_method(t[-1] - t[0])
+        rhs = self.make_rhs(factors, transfers, sharpness)
+        solver_rhs = rhs
+        deadline = None
+        if time_limit is not None:
+            def solver_rhs(_t, x):
+                if time.monotonic() > deadline:
+                    raise SolverTimeout("Решатель не уложился в отведённое время")
+                return rhs(_t, x)
+        # По умолчанию те же допуски, что у odeint
+        options.setdefault('rtol', 1.49012e-8)
+        options.setdefault('atol', 1.49012e-8)
+        self._jacobian_options(method, factors, transfers, sharpness, options)
+
+        events = []
+        for i, level, kind in levels:
+            def event(_t, x, i=i, level=level):
+                return x[i] - level
+            if stop_on_breach and kind == 'restriction':
+                event.terminal = True
+                event.direction = 1
+            events.append(event)
+
+        # Без t_eval, чтобы sol.t содержал все принятые шаги; значения в точках
+        # сетки берутся из того же интерполянта, что использует t_eval
+        with _ODEPACK_LOCK if method == 'LSODA' else nullcontext():
+            if time_limit is not None:
+                deadline = time.monotonic() + time_limit
+            sol = solve_ivp(solver_rhs, (t[0], t[-1]), np.asarray(y0, dtype=float), method=method,
+                            dense_output=True, events=events or None, **options)
+        if not sol.success:
+            raise RuntimeError(f"Ошибка интегрирования: {sol.message}")
+        if stats is not None:
+            stats.update(steps=len(sol.t) - 1, nfev=int(sol.nfev), njev=int(sol.njev),
+                         last_step=float(sol.t[-1] - sol.t[-2]) if len(sol.t) > 1 else None)
+
+        crossings = []
+        for (i, level, kind), times, states in zip(levels, sol.t_events or [], sol.y_events or []):
+            for t_cross, x_cross in zip(times, states):
+                rate = rhs(t_cross, x_cross)[i]
+                crossings.append({
+                    'variable': self.variables[i],
+                    'index': int(i),
+                    'level': float(level),
+                    'kind': kind,
+                    't': float(t_cross),
+                    'direction': 'up' if rate > 0 else 'down',
+                })
+        crossings.sort(key=lambda c: c['t'])
+
+        t_out = t[t <= sol.t[-1]]
+        y_out = sol.sol(t_out).T
+        if sol.status == 1:
+            # Остановка по событию: добавляем точное состояние в момент пересечения
+            stops = [(times[-1], states[-1]) for event, times, states
+                     in zip(events, sol.t_events, sol.y_events)
+                     if getattr(event, 'terminal', False) and len(times)]
+            t_stop, x_stop = min(stops, key=lambda s: s[0])
+            if len(t_out) == 0 or t_out[-1] < t_stop:
+                t_out = np.append(t_out, t_stop)
+                y_out = np.vstack([y_out, x_stop])
+        return t_out, y_out, crossings
+
+    def integrate_fixed(self, y0, t, factors, transfers, levels, stop_on_breach=False, substeps=4):
+        """Дешёвая замена integrate_events: фиксированный шаг (integrate_batch),
+        моменты пересечения — линейной интерполяцией между точками сетки.
+
+        Время расчёта предсказуемо (4 * substeps * (len(t) - 1) вычислений правой
+        части), поэтому используется как запасной вариант при превышении времени.
+        Результат в том же виде, что у integrate_events.
+        """
+        t = np.asarray(t, dtype=float)
+        y = self.integrate_batch(np.asarray(y0, dtype=float)[None], t,
+                                 np.asarray(factors, dtype=float)[None],
+                                 np.asarray(transfers, dtype=float)[None], substeps)[0]
+        crossings = []
+        for i, level, kind in levels:
+            diff = y[:, i] - level
+            for j in np.nonzero(np.sign(diff[:-1]) != np.sign(diff[1:]))[0]:
+                if diff[j] == 0:
+                    continue
+                share = diff[j] / (diff[j] - diff[j + 1])
+                crossings.append({
+                    'variable': self.variables[i],
+                    'index': int(i),
+                    'level': float(level),
+                    'kind': kind,
+                    't': float(t[j] + share * (t[j + 1] - t[j])),
+                    'direction': 'up' if diff[j + 1] > diff[j] else 'down',
+                    'state': y[j] + share * (y[j + 1] - y[j]),
+                })
+        crossings.sort(key=lambda c: c['t'])
+
+        if stop_on_breach:
+            stops = [c for c in crossings if c['kind'] == 'restriction' and c['direction'] == 'up']
+            if stops:
+                t_stop, x_stop = stops[0]['t'], stops[0]['state']
+                keep = t < t_stop
+                t, y = np.append(t[keep], t_stop), np.vstack([y[keep], x_stop])
+                crossings = [c for c in crossings if c['t'] <= t_stop]
+        for crossing in crossings:
+            del crossing['state']
+        return t, y, crossings
+
+
+DEFAULT_MODEL = CompiledModel(DEFAULT_SPEC)
+
+
+def check_default_spec(samples=1000, seed=0, tolerance=1e-12):
+    """Сверяет правую часть DEFAULT_MODEL с functions.pend в случайных точках.
+
+    Точки берутся и за пределами ограничений, чтобы проверить все ветви clip.
+    Возвращает наибольшее расхождение; если оно больше tolerance — AssertionError.
+    """
+    import functions
+
+    rng = np.random.default_rng(seed)
+    n, m, q = DEFAULT_MODEL.n, DEFAULT_MODEL.m, len(DEFAULT_MODEL.transfers)
+    worst = 0.0
+    for _ in range(samples):
+        u = rng.uniform(-0.5, 1.5, n)
+        t = rng.uniform(0.0, 2.0)
+        factors = np.column_stack([rng.uniform(-0.5, 1.5, m), rng.uniform(-1.0, 1.0, m)])
+        transfers = np.column_stack([rng.uniform(-2.0, 2.0, q), rng.uniform(-0.5, 1.5, q)])
+        expected = functions.pend(u, t, factors, transfers)
+        worst = max(worst, float(np.abs(DEFAULT_MODEL.pend(u, t, factors, transfers) - expected).max()))
+    if worst > tolerance:
+        raise AssertionError(f"DEFAULT_SPEC расходится с functions.pend: {worst:.3g}")
+    return worst
+
+
+if __name__ == '__main__':
+    print(f"DEFAULT_SPEC совпадает с functions.pend, наибольшее расхождение {check_default_spec():.3g}")
@@ -1,18 +1,17 @@
 # process.py
-import matplotlib
-matplotlib.use('Agg') 
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.integrate import odeint
 import logging
 
-from functions import pend
+import image_formats
+import memory
+from model_spec import DEFAULT_MODEL
 from radar_diagram import RadarDiagram
+from utils import new_figure, save_image_files
 
-data_sol = []
 logger = logging.getLogger(__name__)
 
-def fill_diagrams(data, initial_equations, restrictions):
+def fill_diagrams(data, initial_equations, restrictions, fmt='png'):
+    """Пять диаграмм: {имя файла без расширения: байты изображения}"""
     radar = RadarDiagram()
     
     clipped_initial = np.clip(initial_equations, 0, 1.0)
@@ -35,40 +34,27 @@ def fill_diagrams(data, initial_equations, restrictions):
         "Характеристики системы при t=1"
     ]
     
-    filenames = [
-        './static/images/diagram.png',
-        './static/images/diagram2.png',
-        './static/images/diagram3.png',
-        './static/images/diagram4.png',
-        './static/images/diagram5.png'
-    ]
+    stems = ['diagram', 'diagram2', 'diagram3', 'diagram4', 'diagram5']
+    images = {}
 
-    for i, (idx, title, fname) in enumerate(zip(time_indices, titles, filenames)):
+    for i, (idx, title, stem) in enumerate(zip(time_indices, titles, stems)):
         current_vals = clipped_data[idx]
         
-        if i == 0:
-            radar.draw(
-                filename=fname,
-                initial_data=clipped_initial,
-                current_data=current_vals,
-                label="",
-                title=title,
-                restrictions=clipped_restrictions,
-                show_both_lines=False
-            )
-        else:
-            radar.draw(
-                filename=fname,
-                initial_data=clipped_initial,
-                current_data=current_vals,
-                label="",
-                title=title,
-                restrictions=clipped_restrictions,
-                show_both_lines=True
-            )
+        # В начальный момент текущие значения совпадают с начальными: рисуем одну линию
+        images[stem] = radar.draw_bytes(
+            data=current_vals,
+            label="",
+            title=title,
+            restrictions=clipped_restrictions,
+            initial_data=None if i == 0 else clipped_initial,
+            fmt=fmt
+        )
+    
+    return images
 
-def create_graphic(t, data):
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 12))
+def create_graphic(t, data, fmt='png'):
+    fig = new_figure(figsize=(16, 12))
+    ax1, ax2 = fig.subplots(2, 1)
     
     # 8 характеристик для авиационной модели
     labels_x1_x4 = [
@@ -134,9 +120,8 @@ def create_graphic(t, data):
     ax2.tick_params(axis='both', which='major', labelsize=12)
     ax2.axhline(y=1.0, color='red', linestyle=':', alpha=0.7, linewidth=1, label='Предел')
     
-    plt.tight_layout(pad=3.0)
-    fig.savefig('./static/images/figure.png', bbox_inches='tight', dpi=150)
-    plt.close(fig)
+    fig.tight_layout(pad=3.0)
+    return image_formats.encode(fig, fmt, dpi=150)
 
 def cast_to_float(initial_equations, faks, equations, restrictions):
     for i in range(len(initial_equations)):
@@ -155,23 +140,34 @@ def cast_to_float(initial_equations, faks, equations, restrictions):
 
     return initial_equations, faks, restrictions
 
-def process(initial_equations, faks, equations, restrictions):
-    global data_sol
-
+def process(initial_equations, faks, equations, restrictions, fmt='png'):
+    """Расчёт и изображения в static/images; возвращает размеры изображений и список изменившихся"""
     initial_equations, faks, restrictions = cast_to_float(initial_equations, faks, equations, restrictions)
     t = np.linspace(0, 1, 100)
     
     # Запуск симуляции с 8 характеристиками
-    data_sol = odeint(pend, initial_equations[:8], t, args=(faks, equations))
+    data_sol = DEFAULT_MODEL.odeint(initial_equations[:8], t, faks, equations)
     
     data_sol = np.clip(data_sol, 1e-3, 1.0)
     
-    create_graphic(t, data_sol)
-    create_disturbances_graphic(t, faks)  
-    fill_diagrams(data_sol, initial_equations[:8], restrictions[:8])
+    with memory.stage('process_render'):
+        images = {
+            'figure': create_graphic(t, data_sol, fmt),
+            'disturbances': create_disturbances_graphic(t, faks, fmt),
+        }
+        images.update(fill_diagrams(data_sol, initial_equations[:8], restrictions[:8], fmt))
+    
+    # Перезаписываются только изменившиеся файлы
+    with memory.stage('save_images'):
+        changed = save_image_files(images, fmt)
+    return {
+        'image_bytes': {stem: len(data) for stem, data in images.items()},
+        'changed': changed,
+    }
 
-def create_disturbances_graphic(t, faks):
-    fig, axs = plt.subplots(figsize=(16, 8))
+def create_disturbances_graphic(t, faks, fmt='png'):
+    fig = new_figure(figsize=(16, 8))
+    axs = fig.subplots()
     
     disturbances_labels = [
         "F₁: Средняя выработка ресурса до списания",
@@ -209,6 +205,5 @@ def create_disturbances_graphic(t, faks):
     axs.grid(True, alpha=0.3, linestyle='--')
     axs.tick_params(axis='both', which='major', labelsize=12)
     
-    plt.tight_layout()
-    fig.savefig('./static/images/disturbances.png', bbox_inches='tight', dpi=150)
-    plt.close(fig)
\ No newline at end of file
+    fig.tight_layout()
+    return image_formats.encode(fig, fmt, dpi=150)
\ No newline at end of file
@@ -1,19 +1,34 @@
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
+import image_formats
 from matplotlib.patches import Circle, RegularPolygon
 from matplotlib.path import Path
 from matplotlib.projections.polar import PolarAxes
 from matplotlib.projections import register_projection
 from matplotlib.spines import Spine
 from matplotlib.transforms import Affine2D
+from utils import new_figure
+
+# Проекции регистрируются глобально в matplotlib, поэтому делаем это один раз
+_registered = {}
+_register_lock = threading.Lock()
 
 
 class RadarDiagram:
     def radar_factory(self, num_vars, frame='circle'):
+        """Возвращает углы осей и имя зарегистрированной проекции"""
         theta = np.linspace(0, 2 * np.pi, num_vars, endpoint=False)
+        projection = f'radar_{num_vars}_{frame}'
+        with _register_lock:
+            if projection not in _registered:
+                register_projection(self._make_axes(projection, theta, num_vars, frame))
+                _registered[projection] = True
+        return theta, projection
 
+    @staticmethod
+    def _make_axes(projection, theta, num_vars, frame):
         class RadarAxes(PolarAxes):
-            name = 'radar'
+            name = projection
             RESOLUTION = 1
 
             def __init__(self, *args, **kwargs):
@@ -58,14 +73,14 @@ class RadarDiagram:
                 else:
                     raise ValueError("Unknown value for 'frame': %s" % frame)
 
-        register_projection(RadarAxes)
-        return theta
+        return RadarAxes
 
     def _render(self, data, label, title, restrictions, initial_data=None):
         N = 8  
-        theta = self.radar_factory(N, frame='polygon')
+        theta, projection = self.radar_factory(N, frame='polygon')
         
-        fig, axs = plt.subplots(figsize=(10, 10), subplot_kw=dict(projection='radar'))
+        fig = new_figure(figsize=(10, 10))
+        axs = fig.subplots(subplot_kw=dict(projection=projection))
         fig.subplots_adjust(top=0.85, bottom=0.05)
         
         data_clipped = np.minimum(data, restrictions)
@@ -86,18 +101,11 @@ class RadarDiagram:
         max_val = max(np.max(restrictions), np.max(data_clipped)) * 1.1
         axs.set_ylim(0, max_val)
         
-        plt.draw()
         return fig
-    def draw(self, filename, data, label, title, restrictions, initial_data=None):
-        fig = self._render(data, label, title, restrictions, initial_data)
-        fig.savefig(filename, bbox_inches='tight')
-        plt.close(fig)
+    def draw(self, filename, data, label, title, restrictions, initial_data=None, dpi=None, tight=True, fmt='png'):
+        with open(filename, 'wb') as f:
+            f.write(self.draw_bytes(data, label, title, restrictions, initial_data, dpi, tight, fmt))
 
-    def draw_bytes(self, data, label, title, restrictions, initial_data=None):
-        import io
+    def draw_bytes(self, data, label, title, restrictions, initial_data=None, dpi=None, tight=True, fmt='png'):
         fig = self._render(data, label, title, restrictions, initial_data)
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
-        return buf.read()
\ No newline at end of file
+        return image_formats.encode(fig, fmt, dpi=dpi, tight=tight)
\ No newline at end of file
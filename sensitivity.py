@@ -0,0 +1,83 @@
+# sensitivity.py
+"""Локальная чувствительность характеристик к входам формы.
+
+Производные dX(t)/dp для всех параметров считаются одним совместным решением
+системы X' = f(X, p), S' = Jx·S + Jp (см. CompiledModel.sensitivities).
+"""
+import numpy as np
+
+from model_spec import DEFAULT_MODEL
+from utils import new_figure
+from web_core import EQ_B_BOUNDS, EQ_K_BOUNDS, FAK_A_BOUNDS, FAK_B_BOUNDS, U_BOUNDS, _fig_to_base64
+
+# Имена параметров совпадают с именами полей формы
+PARAM_NAMES = (
+    [f'u{i}' for i in range(1, 9)]
+    + [f'fak{i}_{c}' for i in range(1, 6) for c in ('a', 'b')]
+    + [f'f{i}_{c}' for i in range(1, 19) for c in ('k', 'b')]
+)
+
+
+def _span(bounds):
+    return bounds[1] - bounds[0]
+
+
+# Ширина допустимого диапазона каждого параметра (границы parse_form)
+PARAM_SPANS = np.r_[
+    [_span(U_BOUNDS)] * 8,
+    [_span(FAK_A_BOUNDS), _span(FAK_B_BOUNDS)] * 5,
+    [_span(EQ_K_BOUNDS), _span(EQ_B_BOUNDS)] * 18,
+]
+
+
+def analyze(initial_equations, factors, equations, target='X8', t_grid=None):
+    """Чувствительности для сценария.
+
+    Возвращает словарь: t, X, S (T, 8, P) и рейтинг влияния на target в конце
+    интервала — производная, умноженная на ширину диапазона параметра.
+    """
+    if t_grid is None:
+        t_grid = np.linspace(0, 1, 50)
+    u = np.array(initial_equations[:8], dtype=float)
+    # Начальные значения ограничиваются, как в simulate: вне [0.1, 0.9] производная нулевая
+    inside = ((u > 0.1) & (u < 0.9)).astype(float)
+    X, S = DEFAULT_MODEL.sensitivities(np.clip(u, 0.1, 0.9), t_grid, factors, equations,
+                                       y0_grad=np.diag(inside))
+
+    target_index = DEFAULT_MODEL.variables.index(target)
+    final = S[-1, target_index]
+    scaled = final * PARAM_SPANS
+    order = np.argsort(-np.abs(scaled))
+    ranking = [
+        {'param': PARAM_NAMES[j], 'derivative': float(final[j]), 'effect': float(scaled[j])}
+        for j in order if scaled[j] != 0
+    ]
+    return {
+        't': t_grid,
+        'X': X,
+        'S': S,
+        'target': target,
+        'ranking': ranking,
+    }
+
+
+def draw_tornado(ranking, target, top=15):
+    """Торнадо-диаграмма: изменение target при проходе параметра по его диапазону"""
+    items = ranking[:top][::-1]
+    fig = new_figure(figsize=(10, max(3, 0.4 * len(items) + 1.5)))
+    ax = fig.subplots()
+
+    names = [item['param'] for item in items]
+    half = np.array([item['effect'] for item in items]) / 2
+    colors = ['#d62728' if h > 0 else '#1f77b4' for h in half]
+
+    ax.barh(names, half, color=colors, alpha=0.8)
+    ax.barh(names, -half, color=colors, alpha=0.35)
+    ax.axvline(0, color='black', linewidth=0.8)
+
+    ax.set_xlabel(f"Изменение {target} при t=1 (параметр от минимума до максимума)", fontsize=9, fontweight='bold')
+    ax.set_title(f"Наиболее влиятельные параметры для {target}", fontsize=12, fontweight='bold')
+    ax.grid(True, axis='x', alpha=0.3)
+
+    fig.tight_layout()
+    return _fig_to_base64(fig)
@@ -0,0 +1,74 @@
+# single_flight.py
+"""Объединение одинаковых одновременных вычислений.
+
+Пока вычисление для ключа выполняется, повторные вызовы с тем же ключом не
+запускают своё, а ждут его и получают тот же результат (или то же
+исключение). Результат не кэшируется: после завершения следующий вызов
+считает заново.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'leaders': 0, 'shared': 0, 'timeouts': 0, 'errors': 0}
+
+    def do(self, key, fn, timeout=None):
+        """Результат fn() для key; возвращает (результат, получен ли он от другого вызова).
+
+        Ожидающий вызов ждёт не дольше timeout секунд и затем получает
+        TimeoutError; само вычисление при этом продолжается.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['leaders'] += 1
+            else:
+                call.waiters += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    if call.error is not None:
+                        self.stats['errors'] += 1
+                call.done.set()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        if not call.done.wait(timeout):
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise TimeoutError(f"Истекло время ожидания одинакового расчёта ({timeout} с)")
+        if call.error is not None:
+            raise call.error
+        with self._lock:
+            self.stats['shared'] += 1
+        return call.result, True
+
+    def running(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def in_flight(self):
+        """Число выполняющихся вычислений и ожидающих их вызовов"""
+        with self._lock:
+            return len(self._calls), sum(call.waiters for call in self._calls.values())
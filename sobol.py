@@ -0,0 +1,127 @@
+# sobol.py
+"""Глобальная чувствительность: индексы Соболя по схеме Сальтелли.
+
+Параметры и их границы — те же, что у суррогата (входы формы, от которых
+зависит модель). Модель считается пакетами через CompiledModel.integrate_batch,
+матрицы выборки обрабатываются частями по chunk_size строк.
+
+    python sobol.py --samples 1024 -o sobol.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from scipy.stats import qmc
+
+from model_spec import DEFAULT_MODEL
+from surrogate import UNUSED_EQUATION, parameter_bounds, used_equations
+from web_core import normalize_trajectory
+
+
+def parameter_names():
+    """Имена параметров вектора суррогата (как у полей формы)"""
+    names = [f'u{i}' for i in range(1, 9)]
+    names += [f'fak{i}_{c}' for i in range(1, 6) for c in ('a', 'b')]
+    names += [f'f{i + 1}_{c}' for i in used_equations() for c in ('k', 'b')]
+    return names
+
+
+def evaluate(P, t, chunk_size=4096):
+    """Значения X1..X8 в конце интервала для строк P (N, d), форма (N, 8)"""
+    eq_index = used_equations()
+    out = np.empty((len(P), DEFAULT_MODEL.n))
+    for start in range(0, len(P), chunk_size):
+        block = P[start:start + chunk_size]
+        u = np.clip(block[:, :8], 0.1, 0.9)
+        faks = block[:, 8:18].reshape(-1, 5, 2)
+        equations = np.tile(UNUSED_EQUATION, (len(block), 18, 1))
+        equations[:, eq_index] = block[:, 18:].reshape(len(block), -1, 2)
+
+        Y = DEFAULT_MODEL.integrate_batch(u, t, faks, equations)
+        out[start:start + len(block)] = normalize_trajectory(Y)[:, -1]
+    return out
+
+
+def _indices(fA, fB, fAB):
+    """Оценки Сальтелли (2010) для первого порядка и Янсена для полного индекса"""
+    var = np.var(np.concatenate([fA, fB]), axis=0)
+    var = np.where(var > 0, var, np.nan)
+    first = np.mean(fB[None] * (fAB - fA[None]), axis=1) / var
+    total = 0.5 * np.mean((fA[None] - fAB) ** 2, axis=1) / var
+    return first, total
+
+
+def analyze(samples=1024, points=50, bootstrap=200, confidence=0.95, chunk_size=4096, seed=0):
+    """Индексы Соболя для X1..X8 в конце интервала.
+
+    Число расчётов модели — samples·(d + 2). Возвращает словарь с индексами
+    первого порядка и полными индексами формы (d, 8) и их доверительными
+    интервалами по бутстрепу.
+    """
+    lo, hi = parameter_bounds()
+    d = len(lo)
+    t = np.linspace(0, 1, points)
+
+    base = qmc.Sobol(2 * d, seed=seed).random(samples)
+    A = qmc.scale(base[:, :d], lo, hi)
+    B = qmc.scale(base[:, d:], lo, hi)
+    AB = np.repeat(A[None], d, axis=0)
+    for i in range(d):
+        AB[i, :, i] = B[:, i]
+
+    started = time.time()
+    fA = evaluate(A, t, chunk_size)
+    fB = evaluate(B, t, chunk_size)
+    fAB = evaluate(AB.reshape(-1, d), t, chunk_size).reshape(d, samples, -1)
+    elapsed = time.time() - started
+
+    first, total = _indices(fA, fB, fAB)
+
+    rng = np.random.default_rng(seed)
+    boot_first, boot_total = [], []
+    for _ in range(bootstrap):
+        idx = rng.integers(0, samples, samples)
+        f, tt = _indices(fA[idx], fB[idx], fAB[:, idx])
+        boot_first.append(f)
+        boot_total.append(tt)
+    alpha = (1 - confidence) / 2 * 100
+    q = (alpha, 100 - alpha)
+
+    return {
+        'params': parameter_names(),
+        'outputs': list(DEFAULT_MODEL.variables),
+        'evaluations': samples * (d + 2),
+        'elapsed': elapsed,
+        'first': first,
+        'total': total,
+        'first_ci': np.nanpercentile(boot_first, q, axis=0),
+        'total_ci': np.nanpercentile(boot_total, q, axis=0),
+    }
+
+
+def to_json(result):
+    """Результат analyze() в виде, пригодном для json.dumps"""
+    return {
+        key: (np.round(value, 6).tolist() if isinstance(value, np.ndarray) else value)
+        for key, value in result.items()
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Индексы Соболя для модели")
+    parser.add_argument('--samples', type=int, default=1024, help="базовый размер выборки N (лучше степень двойки)")
+    parser.add_argument('--bootstrap', type=int, default=200)
+    parser.add_argument('--chunk-size', type=int, default=4096)
+    parser.add_argument('-o', '--out', default=None, help="JSON-файл для результата")
+    args = parser.parse_args()
+
+    result = analyze(args.samples, bootstrap=args.bootstrap, chunk_size=args.chunk_size)
+    print(f"{result['evaluations']} расчётов модели за {result['elapsed']:.1f} с")
+    for j, output in enumerate(result['outputs']):
+        top = np.argsort(-np.nan_to_num(result['total'][:, j]))[:3]
+        print(output + ': ' + ', '.join(
+            f"{result['params'][i]} S1={result['first'][i, j]:.2f} ST={result['total'][i, j]:.2f}" for i in top))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(to_json(result), f, ensure_ascii=False, indent=2)
@@ -2,49 +2,8 @@
 document.addEventListener('DOMContentLoaded', function() {
     const disturbancesImage = document.getElementById('disturbances-image')
     const imageContainer = document.querySelector('.image-container')
-    
-    if (disturbancesImage) {
-        // Проверяем, загружается ли изображение
-        disturbancesImage.onerror = function() {
-            // Если изображение не загружено, показываем сообщение
-            if (imageContainer) {
-                imageContainer.innerHTML = `
-                    <div class="no-data-message">
-                        <h3>График возмущений не доступен</h3>
-                        <p>Выполните расчеты на странице "Параметры" чтобы увидеть график возмущений</p>
-                        <a href="/" class="btn-calculate" style="margin-top: 15px; display: inline-block;">
-                            Перейти к параметрам
-                        </a>
-                    </div>
-                `
-            }
-        }
-        
-        // Проверяем, существует ли изображение
-        const img = new Image()
-        img.src = disturbancesImage.src
-        
-        img.onload = function() {
-            // Изображение загружено успешно
-            disturbancesImage.style.visibility = 'visible'
-        }
-        
-        img.onerror = function() {
-            // Изображение не найдено
-            if (imageContainer) {
-                imageContainer.innerHTML = `
-                    <div class="no-data-message">
-                        <h3>График возмущений не доступен</h3>
-                        <p>Выполните расчеты на странице "Параметры" чтобы увидеть график возмущений</p>
-                        <a href="/" class="btn-calculate" style="margin-top: 15px; display: inline-block;">
-                            Перейти к параметрам
-                        </a>
-                    </div>
-                `
-            }
-        }
-    } else {
-        // Если элемента изображения нет
+
+    function showMissing() {
         if (imageContainer) {
             imageContainer.innerHTML = `
                 <div class="no-data-message">
@@ -57,4 +16,19 @@ document.addEventListener('DOMContentLoaded', function() {
             `
         }
     }
+
+    if (!disturbancesImage) {
+        // Если элемента изображения нет
+        showMissing()
+        return
+    }
+
+    // Проверяем само изображение на странице, без повторного запроса файла
+    if (disturbancesImage.complete) {
+        if (disturbancesImage.naturalWidth === 0) {
+            showMissing()
+        }
+    } else {
+        disturbancesImage.addEventListener('error', showMissing)
+    }
 })
\ No newline at end of file
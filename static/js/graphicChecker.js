@@ -2,50 +2,8 @@
 document.addEventListener('DOMContentLoaded', function() {
     const graphicImage = document.getElementById('graphic-image')
     const imageContainer = document.querySelector('.image-container')
-    
-    // Проверяем наличие файла
-    if (graphicImage) {
-        // Проверяем, загружается ли изображение
-        graphicImage.onerror = function() {
-            // Если изображение не загружено, показываем сообщение
-            if (imageContainer) {
-                imageContainer.innerHTML = `
-                    <div class="no-data-message">
-                        <h3>График не доступен</h3>
-                        <p>Выполните расчеты на странице "Параметры" чтобы увидеть график</p>
-                        <a href="/" class="btn-calculate" style="margin-top: 15px; display: inline-block;">
-                            Перейти к параметрам
-                        </a>
-                    </div>
-                `
-            }
-        }
-        
-        // Проверяем, существует ли изображение
-        const img = new Image()
-        img.src = graphicImage.src
-        
-        img.onload = function() {
-            // Изображение загружено успешно
-            graphicImage.style.visibility = 'visible'
-        }
-        
-        img.onerror = function() {
-            // Изображение не найдено
-            if (imageContainer) {
-                imageContainer.innerHTML = `
-                    <div class="no-data-message">
-                        <h3>График не доступен</h3>
-                        <p>Выполните расчеты на странице "Параметры" чтобы увидеть график</p>
-                        <a href="/" class="btn-calculate" style="margin-top: 15px; display: inline-block;">
-                            Перейти к параметрам
-                        </a>
-                    </div>
-                `
-            }
-        }
-    } else {
-        // Если элемента изображения нет
+
+    function showMissing() {
         if (imageContainer) {
             imageContainer.innerHTML = `
                 <div class="no-data-message">
@@ -58,4 +16,19 @@ document.addEventListener('DOMContentLoaded', function() {
             `
         }
     }
+
+    if (!graphicImage) {
+        // Если элемента изображения нет
+        showMissing()
+        return
+    }
+
+    // Проверяем само изображение на странице, без повторного запроса файла
+    if (graphicImage.complete) {
+        if (graphicImage.naturalWidth === 0) {
+            showMissing()
+        }
+    } else {
+        graphicImage.addEventListener('error', showMissing)
+    }
 })
\ No newline at end of file
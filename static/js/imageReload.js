@@ -0,0 +1,16 @@
+// static/js/imageReload.js
+// Перезагружает на открытой странице только изменившиеся изображения.
+// Страница параметров после расчёта записывает в localStorage новые URL
+// изменившихся изображений; на остальных вкладках срабатывает событие storage.
+window.addEventListener('storage', function(event) {
+    if (event.key !== 'changedImages' || !event.newValue) {
+        return
+    }
+    const urls = JSON.parse(event.newValue).urls || {}
+    document.querySelectorAll('img[data-image]').forEach(img => {
+        const url = urls[img.dataset.image]
+        if (url && img.getAttribute('src') !== url) {
+            img.src = url
+        }
+    })
+})
@@ -109,6 +109,11 @@ async function process() {
     input.value = result.status
     sessionStorage.setItem("status", result.status)
     
+    // Открытые вкладки с графиками перезагрузят только изменившиеся изображения
+    if (result.urls && Object.keys(result.urls).length) {
+        localStorage.setItem("changedImages", JSON.stringify({urls: result.urls, at: Date.now()}))
+    }
+    
     // Автоматически переходим на страницу графиков
     if (result.status === "Выполнено") {
         setTimeout(() => {
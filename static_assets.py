@@ -0,0 +1,209 @@
+# static_assets.py
+"""Сборка статических файлов: отпечатки содержимого и предсжатые варианты.
+
+Запуск при сборке:  python static_assets.py
+Если манифест отсутствует или устарел, он пересобирается при старте приложения.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_file, url_for
+
+import memory
+from image_formats import EXTENSIONS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = 'static'
+BUILD_DIR = os.path.join(STATIC_DIR, 'build')
+MANIFEST_PATH = os.path.join(BUILD_DIR, 'manifest.json')
+IMAGES_DIR = os.path.join(STATIC_DIR, 'images')
+
+ASSET_FILES = [
+    'style.css',
+    'css/style.css',
+    'js/script.js',
+    'js/graphicChecker.js',
+    'js/diagramsChecker.js',
+    'js/disturbancesChecker.js',
+    'js/imageReload.js',
+]
+
+ONE_YEAR = 365 * 24 * 3600
+
+_manifest = {}
+_by_file = {}
+_image_versions = {}
+memory.register_cache('image_versions', lambda: len(_image_versions), _image_versions.clear)
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def build_assets(static_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    """Копирует файлы с хэшем в имени и создаёт .gz/.br варианты"""
+    manifest = {}
+    for name in ASSET_FILES:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            data = f.read()
+        digest = _digest(data)
+        root, ext = os.path.splitext(name)
+        fingerprinted = f"{root}.{digest}{ext}"
+
+        target = os.path.join(build_dir, fingerprinted)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+        encodings = []
+        # mtime=0, чтобы повторная сборка давала те же байты
+        gz = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gz) < len(data):
+            with open(target + '.gz', 'wb') as f:
+                f.write(gz)
+            encodings.append('gzip')
+        if brotli is not None:
+            br = brotli.compress(data, quality=11)
+            if len(br) < len(data):
+                with open(target + '.br', 'wb') as f:
+                    f.write(br)
+                encodings.append('br')
+
+        manifest[name] = {'file': fingerprinted, 'hash': digest, 'encodings': encodings}
+
+    with open(os.path.join(build_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def _is_stale(manifest, static_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    for name in ASSET_FILES:
+        entry = manifest.get(name)
+        if entry is None or not os.path.exists(os.path.join(build_dir, entry['file'])):
+            return True
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            if _digest(f.read()) != entry['hash']:
+                return True
+    return False
+
+
+def load_manifest():
+    manifest = None
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    if manifest is None or _is_stale(manifest):
+        manifest = build_assets()
+    return manifest
+
+
+def asset_url(name):
+    """URL файла с отпечатком содержимого; для неизвестных файлов — обычный /static"""
+    entry = _manifest.get(name)
+    if entry is None:
+        return url_for('static', filename=name)
+    return url_for('assets', filename=entry['file'])
+
+
+def image_version(name):
+    """Короткий хэш содержимого изображения результата (кэшируется по mtime и размеру)"""
+    path = os.path.join(IMAGES_DIR, name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _image_versions.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path, 'rb') as f:
+        version = _digest(f.read())
+    _image_versions[name] = (key, version)
+    return version
+
+
+def resolve_image(name):
+    """Имя файла изображения; для имени без расширения — тот формат, что записан последним"""
+    if os.path.splitext(name)[1]:
+        return name
+    candidates = [f'{name}.{ext}' for ext in EXTENSIONS
+                  if os.path.exists(os.path.join(IMAGES_DIR, f'{name}.{ext}'))]
+    if not candidates:
+        return f'{name}.png'
+    return max(candidates, key=lambda c: os.path.getmtime(os.path.join(IMAGES_DIR, c)))
+
+
+def image_url(name):
+    name = resolve_image(name)
+    version = image_version(name)
+    if version is None:
+        return url_for('static', filename=f'images/{name}')
+    return url_for('static', filename=f'images/{name}', v=version)
+
+
+def _choose_encoding(entry):
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in entry['encodings'] and accepted[encoding]:
+            return encoding
+    return None
+
+
+def serve_asset(filename):
+    entry = _by_file.get(filename)
+    if entry is None:
+        abort(404)
+
+    encoding = _choose_encoding(entry)
+    path = os.path.join(BUILD_DIR, filename)
+    etag = entry['hash']
+    if encoding is not None:
+        path += '.gz' if encoding == 'gzip' else '.br'
+        etag = f"{etag}-{encoding}"
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_file(os.path.abspath(path), mimetype=mimetype, etag=etag,
+                         max_age=ONE_YEAR, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _image_cache_headers(response):
+    if request.path.startswith('/static/images/'):
+        if request.args.get('v'):
+            # URL содержит хэш содержимого — его можно кэшировать навсегда
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+    return response
+
+
+def init_assets(app):
+    """Подключает манифест, маршрут /assets и функции для шаблонов"""
+    global _manifest, _by_file
+    _manifest = load_manifest()
+    _by_file = {entry['file']: entry for entry in _manifest.values()}
+
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.add_template_global(asset_url)
+    app.add_template_global(image_url)
+    app.after_request(_image_cache_headers)
+
+
+if __name__ == '__main__':
+    for name, entry in build_assets().items():
+        print(f"{name} -> {entry['file']} ({', '.join(entry['encodings']) or 'без сжатия'})")
@@ -0,0 +1,268 @@
+# surrogate.py
+"""Суррогатная модель для мгновенного предпросмотра траекторий.
+
+Квадратичная регрессия по входам формы (начальные значения, коэффициенты
+возмущений и используемых моделью функций f), обученная на пакете расчётов
+DEFAULT_MODEL. Границы обучения — диапазоны parse_form, расширенные так,
+чтобы в них попадал сценарий по умолчанию.
+
+Ошибка оценивается для каждого запроса второй квадратичной регрессией —
+логарифма ошибки по каждой характеристике, измеренной на обучающей выборке
+перекрёстной проверкой; множитель подобран на отложенной выборке так, чтобы
+оценка покрывала фактическую ошибку в доле ERROR_COVERAGE запросов. Если
+запрос выходит за границы обучения или оценка ошибки больше допустимой,
+расчёт выполняется настоящим решателем.
+
+Обучение:  python surrogate.py --samples 2048
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from contextlib import nullcontext
+from multiprocessing import Pool
+
+import numpy as np
+from scipy.stats import qmc
+
+import memory
+from model_spec import DEFAULT_MODEL, DEFAULT_SPEC
+from web_core import (EQ_B_BOUNDS, EQ_K_BOUNDS, FAK_A_BOUNDS, FAK_B_BOUNDS, U_BOUNDS,
+                      build_default_inputs, normalize_trajectory, simulate)
+
+MODEL_PATH = 'surrogate_model.npz'
+
+# Версия формата файла суррогата; файлы старого формата считаются устаревшими
+FORMAT_VERSION = 3
+
+# Допустимая ошибка предпросмотра по умолчанию (в единицах графика [0, 1])
+DEFAULT_TOLERANCE = 0.1
+# Доля запросов, для которых оценка ошибки не меньше фактической
+ERROR_COVERAGE = 0.95
+# Число частей перекрёстной проверки при обучении модели ошибки
+ERROR_FOLDS = 8
+# Нижняя граница ошибки перед логарифмом
+ERROR_FLOOR = 1e-4
+
+# Заполнитель для функций f, которые модель не использует
+UNUSED_EQUATION = [0.3, 0.5]
+
+
+def model_version():
+    """Версия модели: обученный суррогат действителен только для неё"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256(json.dumps(DEFAULT_SPEC, sort_keys=True).encode('utf-8'))
+    digest.update(f'format {FORMAT_VERSION}'.encode('utf-8'))
+    with open(os.path.join(base_dir, 'model_spec.py'), 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def used_equations():
+    """Номера функций f (с нуля), от которых действительно зависит модель"""
+    return np.unique(DEFAULT_MODEL.tr_param)
+
+
+def parameter_bounds():
+    """Границы обучения: диапазоны parse_form, расширенные до значений по умолчанию"""
+    n_eq = len(used_equations())
+    lo = np.r_[[U_BOUNDS[0]] * 8, [FAK_A_BOUNDS[0], FAK_B_BOUNDS[0]] * 5, [EQ_K_BOUNDS[0], EQ_B_BOUNDS[0]] * n_eq]
+    hi = np.r_[[U_BOUNDS[1]] * 8, [FAK_A_BOUNDS[1], FAK_B_BOUNDS[1]] * 5, [EQ_K_BOUNDS[1], EQ_B_BOUNDS[1]] * n_eq]
+    defaults = build_default_inputs()
+    p = to_vector(defaults['u'], defaults['faks'], defaults['equations'])
+    return np.minimum(lo, p), np.maximum(hi, p)
+
+
+def to_vector(u, faks, equations):
+    """Входы формы -> вектор параметров суррогата"""
+    eq = np.asarray(equations, dtype=float).reshape(-1, 2)
+    return np.r_[np.asarray(u, dtype=float)[:8],
+                 np.asarray(faks, dtype=float).reshape(-1)[:10],
+                 eq[used_equations()].reshape(-1)]
+
+
+def from_vector(p):
+    """Вектор параметров -> (u, faks, equations) в формате parse_form"""
+    equations = np.tile(UNUSED_EQUATION, (18, 1))
+    equations[used_equations()] = p[18:].reshape(-1, 2)
+    return p[:8].tolist(), p[8:18].reshape(5, 2).tolist(), equations.tolist()
+
+
+class QuadraticFeatures:
+    """Признаки 1, z_i, z_i·z_j для входов, приведённых к [-1, 1]"""
+
+    def __init__(self, lo, hi):
+        self.lo = lo
+        self.scale = 2.0 / (hi - lo)
+        d = len(lo)
+        self.I, self.J = np.triu_indices(d)
+
+    def __call__(self, X):
+        Z = (np.atleast_2d(X) - self.lo) * self.scale - 1.0
+        return np.hstack([np.ones((len(Z), 1)), Z, Z[:, self.I] * Z[:, self.J]])
+
+
+def _raw_trajectory(args):
+    p, t = args
+    u, faks, equations = from_vector(p)
+    init_eq = np.clip(u, *U_BOUNDS)
+    return DEFAULT_MODEL.odeint(init_eq, t, faks, equations)
+
+
+def _shown_error(predicted, Y):
+    """Наибольшая по времени ошибка того, что видит пользователь, (k, 8)"""
+    return np.abs(normalize_trajectory(predicted) - normalize_trajectory(Y)).max(axis=1)
+
+
+class Surrogate:
+    def __init__(self, weights, lo, hi, t, error_weights, error_scale, version):
+        self.weights = weights
+        self.lo, self.hi = lo, hi
+        self.t = t
+        # Модель ошибки: log(ошибки) по каждой характеристике — квадратичная
+        # регрессия, error_scale — калибровочный множитель (см. ERROR_COVERAGE)
+        self.error_weights = error_weights
+        self.error_scale = error_scale
+        self.version = version
+        self.features = QuadraticFeatures(lo, hi)
+
+    @classmethod
+    def train(cls, samples=2048, validation=512, points=50, workers=None, seed=0):
+        lo, hi = parameter_bounds()
+        t = np.linspace(0, 1, points)
+        X = qmc.scale(qmc.Sobol(len(lo), seed=seed).random(samples), lo, hi)
+        X_val = np.random.default_rng(seed + 1).uniform(lo, hi, (validation, len(lo)))
+
+        with Pool(processes=workers) as pool:
+            Y = np.array(pool.map(_raw_trajectory, [(p, t) for p in X], chunksize=64))
+            Y_val = np.array(pool.map(_raw_trajectory, [(p, t) for p in X_val], chunksize=64))
+
+        features = QuadraticFeatures(lo, hi)
+        Phi = features(X)
+        Y_flat = Y.reshape(samples, -1)
+        weights = np.linalg.lstsq(Phi, Y_flat, rcond=None)[0]
+
+        # Ошибка на обучающей выборке — перекрёстной проверкой, чтобы она не была занижена
+        folds = np.arange(samples) % ERROR_FOLDS
+        predicted = np.empty_like(Y_flat)
+        for fold in range(ERROR_FOLDS):
+            test = folds == fold
+            fold_weights = np.linalg.lstsq(Phi[~test], Y_flat[~test], rcond=None)[0]
+            predicted[test] = Phi[test] @ fold_weights
+        error = _shown_error(predicted.reshape(Y.shape), Y)
+        error_weights = np.linalg.lstsq(Phi, np.log(error + ERROR_FLOOR), rcond=None)[0]
+
+        surrogate = cls(weights, lo, hi, t, error_weights, np.ones(Y.shape[2]), model_version())
+        error_val = _shown_error((features(X_val) @ weights).reshape(Y_val.shape), Y_val)
+        ratio = error_val / surrogate.error_estimate(X_val)
+        surrogate.error_scale = np.quantile(ratio, ERROR_COVERAGE, axis=0)
+        return surrogate
+
+    def save(self, path=MODEL_PATH):
+        np.savez(path, weights=self.weights, lo=self.lo, hi=self.hi, t=self.t,
+                 error_weights=self.error_weights, error_scale=self.error_scale, version=self.version)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path) as data:
+            version = str(data['version'])
+            if version != model_version():
+                return None
+            return cls(data['weights'], data['lo'], data['hi'], data['t'],
+                       data['error_weights'], data['error_scale'], version)
+
+    def in_domain(self, p):
+        return bool(np.all(p >= self.lo - 1e-9) and np.all(p <= self.hi + 1e-9))
+
+    def error_estimate(self, p):
+        """Оценка модуля ошибки по каждой характеристике: (8,) для вектора p, (k, 8) для пакета"""
+        estimate = np.exp(self.features(p) @ self.error_weights) * self.error_scale
+        return estimate[0] if np.ndim(p) == 1 else estimate
+
+    def predict(self, u, faks, equations):
+        """Траектория формы (len(t), 8) по суррогату, без нормализации"""
+        p = to_vector(u, faks, equations)
+        return (self.features(p) @ self.weights).reshape(len(self.t), -1)
+
+
+_surrogate = None
+# Время изменения файла, для которого уже известен результат загрузки
+# (в том числе None для устаревшего файла)
+_loaded_mtime = None
+
+
+def _unload_surrogate():
+    global _surrogate, _loaded_mtime
+    _surrogate = None
+    _loaded_mtime = None
+
+
+memory.register_cache('surrogate', lambda: int(_surrogate is not None), _unload_surrogate)
+
+
+def get_surrogate():
+    """Загруженный суррогат или None, если файла нет или он обучен для другой версии модели"""
+    global _surrogate, _loaded_mtime
+    try:
+        mtime = os.stat(MODEL_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime != _loaded_mtime:
+        _surrogate = Surrogate.load(MODEL_PATH) if mtime is not None else None
+        _loaded_mtime = mtime
+    return _surrogate
+
+
+def _summary(t, data, restrictions):
+    restrictions = np.asarray(restrictions, dtype=float)[:8]
+    return {
+        't': t.tolist(),
+        'trajectory': data.round(6).tolist(),
+        'final': data[-1].round(6).tolist(),
+        'max': data.max(axis=0).round(6).tolist(),
+        'breaches': [int(i + 1) for i in np.nonzero(data.max(axis=0) >= restrictions)[0]],
+    }
+
+
+def preview(u, faks, equations, restrictions, tolerance=DEFAULT_TOLERANCE, exact=False,
+            guard=nullcontext):
+    """Предпросмотр: суррогат, если он есть и достаточно точен, иначе решатель.
+
+    guard() — контекст, внутри которого идёт расчёт решателем (например,
+    место admission); на ответы суррогата не влияет.
+    """
+    surrogate = None if exact else get_surrogate()
+    if surrogate is not None:
+        p = to_vector(u, faks, equations)
+        error = surrogate.error_estimate(p) if surrogate.in_domain(p) else None
+        if error is not None and error.max() <= tolerance:
+            started = time.perf_counter()
+            data = normalize_trajectory(surrogate.predict(u, faks, equations))
+            elapsed = time.perf_counter() - started
+            result = _summary(surrogate.t, data, restrictions)
+            result.update(source='surrogate', error=error.round(6).tolist(),
+                          elapsed_us=round(elapsed * 1e6, 1))
+            return result
+
+    with guard():
+        started = time.perf_counter()
+        t, data, _ = simulate(u, faks, equations, restrictions)
+    elapsed = time.perf_counter() - started
+    result = _summary(t, data, restrictions)
+    result.update(source='solver', error=[0.0] * data.shape[1],
+                  elapsed_us=round(elapsed * 1e6, 1))
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Обучение суррогатной модели")
+    parser.add_argument('--samples', type=int, default=2048)
+    parser.add_argument('--validation', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('-o', '--out', default=MODEL_PATH)
+    args = parser.parse_args()
+
+    surrogate = Surrogate.train(args.samples, args.validation, workers=args.workers)
+    surrogate.save(args.out)
+    print(f"Сохранено в {args.out}; калибровка ошибки по X1..X8: {surrogate.error_scale.round(3).tolist()}")
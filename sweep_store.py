@@ -0,0 +1,175 @@
+# sweep_store.py
+"""Хранение траекторий пакетных расчётов вне оперативной памяти.
+
+Траектории лежат в trajectories.npy формы (N, T, 8) и открываются через
+np.memmap, рядом — t.npy, restrictions.npy (N, 8) и params.jsonl с
+параметрами сценариев. Запись и свёртки идут блоками фиксированного размера,
+поэтому потребление памяти не зависит от N.
+
+    python sweep_store.py results/store   — вывести сводку по хранилищу
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+TRAJECTORIES = 'trajectories.npy'
+RESTRICTIONS = 'restrictions.npy'
+TIMES = 't.npy'
+PARAMS = 'params.jsonl'
+
+# Сколько байт читать за один шаг свёртки
+BLOCK_BYTES = 64 * 1024 * 1024
+
+# Число интервалов гистограммы для приближённых перцентилей
+PERCENTILE_BINS = 1024
+
+
+class TrajectoryStore:
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.trajectories = np.load(os.path.join(path, TRAJECTORIES), mmap_mode=mode)
+        self.restrictions = np.load(os.path.join(path, RESTRICTIONS), mmap_mode=mode)
+        self.t = np.load(os.path.join(path, TIMES))
+
+    @classmethod
+    def create(cls, path, n, t, n_vars=8, float32=False):
+        """Создаёт пустое хранилище на N сценариев (файлы размечаются, но не заполняются)"""
+        os.makedirs(path, exist_ok=True)
+        dtype = np.float32 if float32 else np.float64
+        np.lib.format.open_memmap(os.path.join(path, TRAJECTORIES), mode='w+',
+                                  dtype=dtype, shape=(n, len(t), n_vars))
+        np.lib.format.open_memmap(os.path.join(path, RESTRICTIONS), mode='w+',
+                                  dtype=dtype, shape=(n, n_vars))
+        np.save(os.path.join(path, TIMES), np.asarray(t, dtype=float))
+        return cls(path, mode='r+')
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, TRAJECTORIES))
+
+    def __len__(self):
+        return self.trajectories.shape[0]
+
+    def write(self, start, trajectories, restrictions):
+        """Записывает блок сценариев начиная с позиции start"""
+        stop = start + len(trajectories)
+        self.trajectories[start:stop] = trajectories
+        self.restrictions[start:stop] = np.asarray(restrictions)[:, :self.restrictions.shape[1]]
+        self.trajectories.flush()
+        self.restrictions.flush()
+
+    def write_params(self, rows):
+        """Дописывает параметры сценариев в params.jsonl; rows — словари с полем 'index'"""
+        with open(os.path.join(self.path, PARAMS), 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def params(self):
+        """Построчно читает индекс параметров"""
+        with open(os.path.join(self.path, PARAMS), 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def scenario_blocks(self):
+        """Границы (start, stop) блоков сценариев, каждый не больше BLOCK_BYTES"""
+        row_bytes = self.trajectories[0].nbytes if len(self) else 1
+        size = max(1, BLOCK_BYTES // row_bytes)
+        for start in range(0, len(self), size):
+            yield start, min(start + size, len(self))
+
+    # ===============================
+    # ПОТОКОВЫЕ СВЁРТКИ
+    # ===============================
+
+    def max_per_variable(self):
+        """Максимум каждой характеристики по всем сценариям и моментам времени"""
+        result = np.full(self.trajectories.shape[2], -np.inf)
+        for start, stop in self.scenario_blocks():
+            block = self.trajectories[start:stop]
+            result = np.maximum(result, np.nanmax(block, axis=(0, 1)))
+        return result
+
+    def breach_counts(self):
+        """Число сценариев, в которых характеристика достигла своего предела"""
+        counts = np.zeros(self.trajectories.shape[2], dtype=int)
+        for start, stop in self.scenario_blocks():
+            peak = np.nanmax(self.trajectories[start:stop], axis=1)
+            counts += (peak >= self.restrictions[start:stop]).sum(axis=0)
+        return counts
+
+    def _time_range(self):
+        """Минимум и максимум по сценариям для каждого момента и характеристики, (T, 8)"""
+        _, T, n_vars = self.trajectories.shape
+        lo, hi = np.full((T, n_vars), np.inf), np.full((T, n_vars), -np.inf)
+        for start, stop in self.scenario_blocks():
+            block = self.trajectories[start:stop]
+            lo = np.fmin(lo, np.nanmin(block, axis=0))
+            hi = np.fmax(hi, np.nanmax(block, axis=0))
+        return lo, hi
+
+    def percentiles(self, q=(5, 50, 95), bins=PERCENTILE_BINS):
+        """Перцентили по сценариям для каждого момента времени, форма (len(q), T, 8).
+
+        Если все сценарии помещаются в один блок — точно (np.nanpercentile).
+        Иначе приближённо, в два прохода блоками сценариев: диапазон значений,
+        затем гистограмма из bins интервалов на каждый момент и характеристику.
+        По гистограмме известно, в каком интервале лежит каждая порядковая
+        статистика; две соседние статистики оцениваются внутри своих интервалов
+        и интерполируются, как в np.percentile. Поэтому погрешность не больше
+        ширины интервала, (max - min) / bins. Память — T × 8 × bins счётчиков
+        и один блок, от N не зависит.
+        """
+        if len(self) * self.trajectories[0].nbytes <= BLOCK_BYTES:
+            return np.nanpercentile(np.asarray(self.trajectories, dtype=float), q, axis=0)
+
+        _, T, n_vars = self.trajectories.shape
+        lo, hi = self._time_range()
+        width = np.where(hi > lo, (hi - lo) / bins, 0.0)
+        safe_width = np.where(width > 0, width, 1.0)
+        cell = np.arange(T * n_vars).reshape(T, n_vars) * bins
+
+        counts = np.zeros(T * n_vars * bins, dtype=np.int64)
+        for start, stop in self.scenario_blocks():
+            block = np.asarray(self.trajectories[start:stop], dtype=float)
+            valid = ~np.isnan(block)
+            block = np.where(valid, block, lo)
+            index = np.clip(((block - lo) / safe_width).astype(np.int64), 0, bins - 1)
+            counts += np.bincount((cell + index)[valid], minlength=len(counts))
+        counts = counts.reshape(T, n_vars, bins)
+        cumulative = counts.cumsum(axis=2)
+        total = cumulative[:, :, -1]
+
+        def order_statistic(j):
+            """Оценка j-й порядковой статистики (с нуля) внутри её интервала"""
+            k = (cumulative <= j[:, :, None]).sum(axis=2).clip(0, bins - 1)[:, :, None]
+            inside = np.take_along_axis(counts, k, axis=2)[:, :, 0]
+            below = np.take_along_axis(cumulative, k, axis=2)[:, :, 0] - inside
+            share = (j - below + 0.5) / np.maximum(inside, 1)
+            return np.clip(lo + width * (k[:, :, 0] + share), lo, hi)
+
+        result = np.full((len(q), T, n_vars), np.nan)
+        for i, p in enumerate(q):
+            # Позиция в упорядоченной выборке, как у np.percentile (линейная интерполяция)
+            rank = p / 100.0 * np.maximum(total - 1, 0)
+            j = np.floor(rank)
+            frac = rank - j
+            value = (1 - frac) * order_statistic(j) + frac * order_statistic(np.minimum(j + 1, total - 1))
+            result[i] = np.where(total > 0, value, np.nan)
+        return result
+
+    def summary(self, q=(5, 50, 95)):
+        pct = self.percentiles(q)
+        return {
+            'scenarios': len(self),
+            'dtype': str(self.trajectories.dtype),
+            'max': self.max_per_variable().tolist(),
+            'breaches': self.breach_counts().tolist(),
+            'final_percentiles': {str(p): pct[i, -1].tolist() for i, p in enumerate(q)},
+        }
+
+
+if __name__ == '__main__':
+    store = TrajectoryStore(sys.argv[1])
+    print(json.dumps(store.summary(), ensure_ascii=False, indent=2))
@@ -0,0 +1,81 @@
+import pytest
+
+import app as app_module
+import web_core
+from admission import Admission, admission
+
+
+@pytest.fixture
+def client():
+    admission.clear_cache()
+    yield app_module.app.test_client()
+    admission.clear_cache()
+
+
+def _page(response):
+    return response.get_data(as_text=True)
+
+
+def test_trajectory_profile_renders_without_images(client):
+    response = client.post('/', data={'quality': 'trajectory'})
+    assert response.status_code == 200
+    assert "успешно выполнена" in _page(response)
+    assert "Неизвестный формат" not in _page(response)
+
+
+def test_degraded_to_trajectory_renders_without_images(client, monkeypatch):
+    # Профили с изображениями не укладываются в бюджет — остаётся только траектория
+    monkeypatch.setitem(admission.estimates, 'full', 1e6)
+    monkeypatch.setitem(admission.estimates, 'preview', 1e6)
+    before = admission.decisions['trajectory']
+    response = client.post('/', data={'quality': 'full', 'u1': '0.41'})
+    assert response.status_code == 200
+    assert "успешно выполнена" in _page(response)
+    assert admission.decisions['trajectory'] == before + 1
+
+
+@pytest.fixture
+def overloaded(monkeypatch):
+    # Очередь нулевой длины: любой расчёт вне кэша получает отказ
+    monkeypatch.setattr(app_module, 'admission', Admission(slots=1, trajectory_slots=1, max_waiting=0))
+
+
+SCENARIO = {
+    'initial_equations': [0.5] * 8,
+    'faks': [[0.5, 0.1]] * 5,
+    'equations': [[0.3, 0.5]] * 18,
+    'restrictions': [0.9] * 8,
+}
+
+
+@pytest.mark.parametrize('path, payload', [
+    ('/continue', dict(SCENARIO, t_end=2.0)),
+    ('/draw_graphics', SCENARIO),
+    ('/sensitivity', SCENARIO),
+    ('/export', SCENARIO),
+    ('/preview', dict(SCENARIO, exact=True)),
+])
+def test_solver_routes_go_through_admission(client, overloaded, path, payload):
+    response = client.post(path, json=payload)
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert response.get_json()['status'] == "Ошибка"
+
+
+def test_bulk_goes_through_admission(client, overloaded):
+    response = client.post('/bulk', data=b'')
+    assert response.status_code == 503
+
+
+def test_bulk_releases_slot_after_stream(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'admission', Admission(slots=1, trajectory_slots=1))
+    for _ in range(2):
+        response = client.post('/bulk', data=b'')
+        assert response.status_code == 200
+        response.close()
+
+
+def test_default_recompute_goes_through_admission(client, overloaded, monkeypatch):
+    monkeypatch.setattr(web_core, '_default_cache', {})
+    response = client.get('/?run=1')
+    assert response.status_code == 503
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import sweep_store
+from sweep_store import PERCENTILE_BINS, TrajectoryStore
+
+Q = (5, 50, 95)
+
+
+def _store(tmp_path, values):
+    store = TrajectoryStore.create(str(tmp_path / 'store'), len(values), np.linspace(0, 1, values.shape[1]))
+    store.write(0, values, np.ones((len(values), values.shape[2])))
+    return TrajectoryStore(str(tmp_path / 'store'))
+
+
+@pytest.mark.parametrize('n, sample', [
+    (300, lambda rng, shape: rng.lognormal(0.0, 1.5, shape)),
+    (300, lambda rng, shape: rng.normal(0.5, 0.2, shape)),
+    (5000, lambda rng, shape: rng.uniform(0.0, 1.0, shape)),
+])
+def test_histogram_percentiles_within_one_bin(tmp_path, monkeypatch, n, sample):
+    values = sample(np.random.default_rng(0), (n, 20, 8))
+    values[::7, 3, 2] = np.nan
+    store = _store(tmp_path, values)
+    # Маленький блок — чтобы считалось гистограммой, а не точно
+    monkeypatch.setattr(sweep_store, 'BLOCK_BYTES', 20 * 8 * 8 * 16)
+
+    expected = np.nanpercentile(values, Q, axis=0)
+    bin_width = (np.nanmax(values, axis=0) - np.nanmin(values, axis=0)) / PERCENTILE_BINS
+    error = np.abs(store.percentiles(Q) - expected)
+    assert (error <= bin_width * (1 + 1e-9) + 1e-12).all()
+
+
+def test_small_store_percentiles_are_exact(tmp_path):
+    values = np.random.default_rng(1).lognormal(0.0, 1.5, (300, 20, 8))
+    store = _store(tmp_path, values)
+    np.testing.assert_allclose(store.percentiles(Q), np.percentile(values, Q, axis=0), rtol=0, atol=1e-12)
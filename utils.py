@@ -1,17 +1,100 @@
 # utils.py
+import hashlib
 import os
+import tempfile
+import weakref
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import memory
+
+# Ещё не освобождённые фигуры (для учёта памяти)
+_live_figures = weakref.WeakSet()
+
+def new_figure(**kwargs):
+    """Отдельная фигура со своим Agg-холстом, без глобального состояния pyplot"""
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    _live_figures.add(fig)
+    return fig
+
+def live_figure_count():
+    """Число фигур, которые ещё не собраны сборщиком мусора"""
+    return len(_live_figures)
+
+IMAGES_DIR = 'static/images'
+
+# Хэши уже записанных файлов: путь -> (mtime_ns, размер, sha256), чтобы не перечитывать их
+_written = {}
+
+def _file_digest(path):
+    st = os.stat(path)
+    cached = _written.get(path)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).digest()
+    _written[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+def write_if_changed(path, data):
+    """Записывает data в path, только если содержимое изменилось; возвращает True, если файл записан.
+
+    Запись идёт во временный файл в том же каталоге и заменяет старый через
+    os.replace, поэтому читатель никогда не видит файл записанным наполовину.
+    """
+    digest = hashlib.sha256(data).digest()
+    try:
+        if os.path.getsize(path) == len(data) and _file_digest(path) == digest:
+            return False
+    except OSError:
+        pass
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    st = os.stat(path)
+    _written[path] = (st.st_mtime_ns, st.st_size, digest)
+    return True
+
+def save_image_files(images, fmt='png', directory=IMAGES_DIR):
+    """Сохраняет изображения {имя без расширения: байты}; возвращает имена изменившихся.
+
+    images может быть и итератором пар (имя, байты) — тогда в памяти
+    одновременно держится только одно изображение. Файлы того же имени
+    в других форматах удаляются.
+    """
+    from image_formats import EXTENSIONS, extension
+    ext = extension(fmt)
+    changed = []
+    for stem, data in (images.items() if isinstance(images, dict) else images):
+        if write_if_changed(os.path.join(directory, f'{stem}.{ext}'), data):
+            changed.append(stem)
+        for other in EXTENSIONS:
+            path = os.path.join(directory, f'{stem}.{other}')
+            if other != ext and os.path.exists(path):
+                os.remove(path)
+    return changed
+
+def _trim_written():
+    _written.clear()
+
+memory.register_cache('image_hashes', lambda: len(_written), _trim_written)
+
+IMAGE_STEMS = ['figure', 'disturbances', 'diagram', 'diagram2', 'diagram3', 'diagram4', 'diagram5']
 
 def clear_graphics():
-    """Удаляет сохраненные графики и диаграммы"""
-    image_files = [
-        'static/images/figure.png',
-        'static/images/disturbances.png',
-        'static/images/diagram.png',
-        'static/images/diagram2.png', 
-        'static/images/diagram3.png',
-        'static/images/diagram4.png',
-        'static/images/diagram5.png'
-    ]
+    """Удаляет сохраненные графики и диаграммы (во всех форматах)"""
+    from image_formats import EXTENSIONS
+    image_files = [f'static/images/{stem}.{ext}' for stem in IMAGE_STEMS for ext in EXTENSIONS]
     
     for file_path in image_files:
         if os.path.exists(file_path):
@@ -1,19 +1,22 @@
 import os
 import base64
-import io
+import hashlib
+import json
+from contextlib import nullcontext
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 try:
     from labellines import labelLines
 except ImportError:
     def labelLines(*args, **kwargs):
         return None
-from scipy.integrate import odeint
 from scipy import interpolate
-from functions import pend, F1, F2, F3, F4, F5
+from functions import F1, F2, F3, F4, F5
+import image_formats
+from model_spec import DEFAULT_MODEL, DEFAULT_SPEC, SolverTimeout
 from radar_diagram import RadarDiagram
+from single_flight import SingleFlight
+import memory
+from utils import new_figure
 
 U_LABELS = [
     "Среднее количество нарушений инструкций пилотами",
@@ -28,11 +31,54 @@ U_LABELS = [
 
 F_FUNCTIONS = [F1, F2, F3, F4, F5]
 
-def _fig_to_base64(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight', dpi=150)
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode('ascii')
+# Профили отрисовки: быстрый предпросмотр и полное качество (как раньше)
+RENDER_PROFILES = {
+    'full': {
+        'dpi': 150,
+        'tight': True,          # tight_layout и bbox_inches='tight' (лишний проход отрисовки)
+        'label_boxes': True,    # подложки под подписями линий
+        'smooth_points': 1000,  # точек в сглаженных кривых возмущений
+        'radar_dpi': 100,
+        'simplify_threshold': 1 / 9,  # значение matplotlib по умолчанию
+    },
+    'preview': {
+        'dpi': 60,
+        'tight': False,
+        'label_boxes': False,
+        'smooth_points': 0,     # кривые строятся по точкам расчёта, без интерполяции
+        'radar_dpi': 50,
+        'simplify_threshold': 0.5,    # более грубое упрощение линий
+    },
+}
+
+def get_profile(profile):
+    if isinstance(profile, dict):
+        return profile
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"Неизвестный профиль отрисовки: {profile}")
+    return RENDER_PROFILES[profile]
+
+def _layout(fig, profile):
+    if profile['tight']:
+        fig.tight_layout()
+    else:
+        # Фиксированные поля вместо tight_layout
+        fig.subplots_adjust(left=0.08, right=0.97, top=0.92, bottom=0.08, hspace=0.35)
+
+def _label_bbox(profile):
+    if not profile['label_boxes']:
+        return None
+    return dict(boxstyle='round,pad=0.15', facecolor='white', edgecolor='none', alpha=0.85)
+
+def _fig_to_base64(fig, profile='full', fmt='png'):
+    profile = get_profile(profile)
+    data = image_formats.encode(fig, fmt, dpi=profile['dpi'], tight=profile['tight'],
+                                simplify_threshold=profile['simplify_threshold'])
+    return base64.b64encode(data).decode('ascii')
+
+def image_sizes(images_b64):
+    """Размер каждого изображения в байтах (без base64)"""
+    return {key: len(base64.b64decode(img)) for key, img in images_b64.items()}
 
 def smooth_data(values, window_size=5):
     if len(values) < window_size:
@@ -56,8 +102,18 @@ def create_smooth_line(t_original, values, num_points=1000):
     except:
         return t_original, values
 
-def draw_factors(t, factors):
-    fig, ax = plt.subplots(figsize=(10, 5))
+# Отступ подписи от кривой по нормали
+LABEL_OFFSET = 0.02
+
+def _label_x(t_min, t_max, index, count):
+    """Положение подписи кривой по t: подписи разнесены равномерно в порядке кривых,
+    чтобы одинаковые данные всегда давали одинаковое изображение"""
+    return t_min + (t_max - t_min) * (0.05 + 0.9 * (index + 0.5) / count)
+
+def draw_factors(t, factors, profile='full'):
+    profile = get_profile(profile)
+    fig = new_figure(figsize=(10, 5))
+    ax = fig.subplots()
     
     line_labels = ["F₁", "F₂", "F₃", "F₄", "F₅"]
     
@@ -79,7 +135,10 @@ def draw_factors(t, factors):
             y_values.append(F_func(v, factors[i]))
         y_values = np.array(y_values)
         
-        t_smooth, y_smooth = create_smooth_line(t, y_values)
+        if profile['smooth_points']:
+            t_smooth, y_smooth = create_smooth_line(t, y_values, profile['smooth_points'])
+        else:
+            t_smooth, y_smooth = t, y_values
         
         curves_data.append((t_smooth, y_smooth, color, line_label))
         
@@ -87,14 +146,11 @@ def draw_factors(t, factors):
     
     num_curves = len(curves_data)
     
-    np.random.seed(42)  
-    
     for idx, (t_curve, y_curve, color, label) in enumerate(curves_data):
         t_min = t_curve[0]
         t_max = t_curve[0] + 0.5 * (t_curve[-1] - t_curve[0])
         
-        x_pos = np.random.uniform(t_min + 0.05 * (t_max - t_min), 
-                                  t_max - 0.05 * (t_max - t_min))
+        x_pos = _label_x(t_min, t_max, idx, num_curves)
         
         closest_idx = np.argmin(np.abs(t_curve - x_pos))
         
@@ -117,7 +173,7 @@ def draw_factors(t, factors):
             elif angle < -90:
                 angle = angle + 180
             
-            offset_multiplier = np.random.uniform(0.015, 0.025)
+            offset_multiplier = LABEL_OFFSET
             
             if closest_idx > 0 and closest_idx < len(y_curve) - 1:
                 tx = t_curve[closest_idx + 1] - t_curve[closest_idx - 1]
@@ -142,10 +198,7 @@ def draw_factors(t, factors):
                    verticalalignment='center', 
                    horizontalalignment='center',
                    rotation=angle,
-                   bbox=dict(boxstyle='round,pad=0.15',  
-                           facecolor='white', 
-                           edgecolor='none', 
-                           alpha=0.85))
+                   bbox=_label_bbox(profile))
     
     ax.set_xlabel("t, время", fontsize=10, fontweight='bold')
     ax.set_ylabel("Значения возмущений", fontsize=8, fontweight='bold')
@@ -160,25 +213,37 @@ def draw_factors(t, factors):
     
     ax.grid(True, alpha=0.3)
 
-    ax.set_xlim(left=0, right=1)
+    ax.set_xlim(left=0, right=max(1.0, t[-1]))
     
     
     ax.set_ylim(0, 1.0)
     
     ax.axhline(y=1.0, color='gray', linestyle='--', alpha=0.3, linewidth=0.5)
     
-    plt.tight_layout()
+    _layout(fig, profile)
     return fig
 
 
-def create_graphics(t, data, factors):
+def mark_crossings(axes, crossings, colors):
+    """Отмечает на графиках моменты пересечения пределов и порогов"""
+    for crossing in crossings or []:
+        i = crossing['index']
+        ax = axes[0] if i < 4 else axes[1]
+        marker = 'X' if crossing['kind'] == 'restriction' else 'o'
+        ax.plot(crossing['t'], min(max(crossing['level'], 0.0), 1.0), marker=marker,
+                color=colors[i], markersize=8, markeredgecolor='black', markeredgewidth=0.8,
+                zorder=5)
+
+def create_graphics(t, data, factors, crossings=None, profile='full', fmt='png'):
+    profile = get_profile(profile)
     figs_b64 = []
     
     subscript_numbers = {
         1: '₁', 2: '₂', 3: '₃', 4: '₄', 5: '₅', 6: '₆', 7: '₇', 8: '₈'
     }
     
-    fig1, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 10))
+    fig1 = new_figure(figsize=(10, 10))
+    ax1, ax2 = fig1.subplots(2, 1)
     
     colors1 = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
     colors2 = ['#9467bd', '#8c564b', '#e377c2', '#7f7f7f']
@@ -194,8 +259,7 @@ def create_graphics(t, data, factors):
         t_min = t[0]
         t_max = t[0] + 0.5 * (t[-1] - t[0])
         
-        x_pos = np.random.uniform(t_min + 0.05 * (t_max - t_min), 
-                                  t_max - 0.05 * (t_max - t_min))
+        x_pos = _label_x(t_min, t_max, i, 4)
         
         closest_idx = np.argmin(np.abs(t - x_pos))
         
@@ -218,7 +282,7 @@ def create_graphics(t, data, factors):
             elif angle < -90:
                 angle = angle + 180
             
-            offset_multiplier = np.random.uniform(0.015, 0.025)
+            offset_multiplier = LABEL_OFFSET
             
             if closest_idx > 0 and closest_idx < len(y_data) - 1:
                 tx = t[closest_idx + 1] - t[closest_idx - 1]
@@ -243,17 +307,14 @@ def create_graphics(t, data, factors):
                    verticalalignment='center', 
                    horizontalalignment='center',
                    rotation=angle,
-                   bbox=dict(boxstyle='round,pad=0.15',  
-                           facecolor='white', 
-                           edgecolor='none', 
-                           alpha=0.85))
+                   bbox=_label_bbox(profile))
     
     ax1.set_xlabel("(t), время", fontweight='bold', fontsize=10)
     ax1.set_ylabel("Значения характеристик", fontsize=8, fontweight='bold')
     ax1.set_title("График 1: Характеристики системы (X₁–X₄)", fontsize=12, fontweight='bold', pad=20)
     ax1.grid(True, alpha=0.3)
     ax1.set_ylim(0.0, 1.0)
-    ax1.set_xlim(0.0, 1.0)
+    ax1.set_xlim(0.0, max(1.0, t[-1]))
     
     for y_val in [0.0, 0.25, 0.5, 0.75, 1.0]:
         ax1.axhline(y=y_val, color='gray', linestyle='--', alpha=0.2, linewidth=0.5)
@@ -283,8 +344,7 @@ def create_graphics(t, data, factors):
         t_min = t[0]
         t_max = t[0] + 0.5 * (t[-1] - t[0])
         
-        x_pos = np.random.uniform(t_min + 0.05 * (t_max - t_min), 
-                                  t_max - 0.05 * (t_max - t_min))
+        x_pos = _label_x(t_min, t_max, i - 4, 4)
         
         closest_idx = np.argmin(np.abs(t - x_pos))
         
@@ -307,7 +367,7 @@ def create_graphics(t, data, factors):
             elif angle < -90:
                 angle = angle + 180
             
-            offset_multiplier = np.random.uniform(0.015, 0.025)
+            offset_multiplier = LABEL_OFFSET
             
             if closest_idx > 0 and closest_idx < len(y_data) - 1:
                 tx = t[closest_idx + 1] - t[closest_idx - 1]
@@ -332,17 +392,14 @@ def create_graphics(t, data, factors):
                    verticalalignment='center', 
                    horizontalalignment='center',
                    rotation=angle,
-                   bbox=dict(boxstyle='round,pad=0.15',  
-                           facecolor='white', 
-                           edgecolor='none', 
-                           alpha=0.85))
+                   bbox=_label_bbox(profile))
     
     ax2.set_xlabel("(t), время", fontweight='bold')
     ax2.set_ylabel("Значения характеристик", fontweight='bold')
     ax2.set_title("График 2: Характеристики системы (X₅–X₈)", fontsize=16, fontweight='bold', pad=20)
     ax2.grid(True, alpha=0.3)
     ax2.set_ylim(0.0, 1.0)
-    ax2.set_xlim(0.0, 1.0)
+    ax2.set_xlim(0.0, max(1.0, t[-1]))
     
     for y_val in [0.0, 0.25, 0.5, 0.75, 1.0]:
         ax2.axhline(y=y_val, color='gray', linestyle='--', alpha=0.2, linewidth=0.5)
@@ -360,17 +417,23 @@ def create_graphics(t, data, factors):
     
     ax2.legend(handles=legend_elements2, fontsize=8, loc='upper right')
     
-    plt.tight_layout()
-    figs_b64.append(_fig_to_base64(fig1))
-    plt.close(fig1)
+    mark_crossings((ax1, ax2), crossings, colors1 + colors2)
+    
+    _layout(fig1, profile)
+    figs_b64.append(_fig_to_base64(fig1, profile, fmt))
     
-    fig2 = draw_factors(t, factors)
-    figs_b64.append(_fig_to_base64(fig2))
-    plt.close(fig2)
+    fig2 = draw_factors(t, factors, profile)
+    figs_b64.append(_fig_to_base64(fig2, profile, fmt))
     
     return figs_b64
 
-def draw_radar_series(data, initial_equations, restrictions):
+def draw_radar_series(data, initial_equations, restrictions, t=None, cache=None, profile='full', fmt='png'):
+    """Пять диаграмм: начальный момент и четверти интервала.
+
+    t — подписывать фактические моменты времени; cache — словарь уже
+    построенных диаграмм по моменту времени (для продолжения расчёта).
+    """
+    profile = get_profile(profile)
     radar = RadarDiagram()
     imgs = []
     time_points = [int(len(data) / 4), int(len(data) / 2), int(len(data) * 3 / 4), -1]
@@ -383,55 +446,190 @@ def draw_radar_series(data, initial_equations, restrictions):
         "Характеристики системы при t=0.75",
         "Характеристики системы при t=1"
     ]
-    
-    imgs.append(base64.b64encode(radar.draw_bytes(initial_equations, labels, titles[0], restrictions, initial_equations)).decode('ascii'))
+    if t is not None:
+        # Расчёт остановлен досрочно или продолжен — подписываем фактические моменты времени
+        titles[1:] = [f"Характеристики системы при t={t[idx]:.2f}" for idx in time_points]
+    
+    def draw(point_data, title, moment):
+        use_cache = cache is not None and moment is not None
+        if use_cache and moment in cache:
+            return cache[moment]
+        img = base64.b64encode(radar.draw_bytes(point_data, labels, title, restrictions, initial_equations,
+                                                dpi=profile['radar_dpi'], tight=profile['tight'],
+                                                fmt=fmt)).decode('ascii')
+        if use_cache:
+            cache[moment] = img
+        return img
+    
+    imgs.append(draw(initial_equations, titles[0], 'initial'))
     
     for i, point_idx in enumerate(time_points):
         point_data = data[point_idx, :]
-        imgs.append(base64.b64encode(radar.draw_bytes(point_data, labels, titles[i+1], restrictions, initial_equations)).decode('ascii'))
+        moment = round(float(t[point_idx]), 9) if t is not None else None
+        imgs.append(draw(point_data, titles[i+1], moment))
     
     return imgs
 
-def run_simulation(initial_equations, factors, equations, restrictions):
+def restriction_levels(restrictions, thresholds=None):
+    """Уровни для поиска пересечений: пределы Xi и пользовательские пороги {'X8': [0.2], ...}"""
+    levels = [(i, float(r), 'restriction') for i, r in enumerate(restrictions[:8])]
+    for name, values in (thresholds or {}).items():
+        i = DEFAULT_MODEL.variables.index(name)
+        levels.extend((i, float(v), 'threshold') for v in values)
+    return levels
+
+def normalize_trajectory(data_sol):
+    """Ограничение решения перед выводом: мягкое ([-0.1, 1.1]), если оно вышло за [0, 1].
+
+    Принимает одну траекторию (T, 8) или пакет (k, T, 8); для пакета
+    ограничение выбирается по каждой траектории отдельно.
+    """
+    data_sol = np.asarray(data_sol)
+    # Без растяжки диапазона!
+    outside = ((data_sol < 0) | (data_sol > 1)).any(axis=(-2, -1), keepdims=True)
+    return np.where(outside, np.clip(data_sol, -0.1, 1.1), np.clip(data_sol, 0.0, 1.0))
+
+# Предел времени решателя в run_simulation, с; после него расчёт повторяется
+# дешёвым методом с фиксированным шагом (0 — без предела)
+SOLVER_TIME_CAP = float(os.environ.get('SOLVER_TIME_CAP', 2.0))
+
+def simulate(initial_equations, factors, equations, restrictions,
+             thresholds=None, stop_on_breach=False, t_grid=None, sharpness=None, stats=None,
+             time_cap=None):
+    """Расчёт траектории без построения графиков: (t, решение (len(t), 8), пересечения).
+
+    sharpness включает гладкое ограничение вместо жёсткого (меньше шагов решателя),
+    в словарь stats записывается статистика решателя.
+    Если решатель не уложился в time_cap секунд, траектория считается методом
+    с фиксированным шагом (stats['fallback'] = 'rk4').
+    """
     init_eq = np.array(initial_equations[:8], dtype=float)
     init_eq = np.clip(init_eq, 0.1, 0.9)
     
-    t = np.linspace(0, 1, 50)
-    
-    data_sol = odeint(pend, init_eq, t, args=(factors, equations))
+    if t_grid is None:
+        t_grid = np.linspace(0, 1, 50)
     
-    def gentle_normalize(values):
-        normalized = np.copy(values)
-        
-        # Только мягкое ограничение
-        for i in range(8):
-            normalized[:, i] = np.clip(normalized[:, i], -0.1, 1.1)
-            
-        # Без растяжки диапазона!
-        return normalized
+    levels = restriction_levels(restrictions, thresholds)
+    try:
+        t, data_sol, crossings = DEFAULT_MODEL.integrate_events(
+            init_eq, t_grid, factors, equations, levels,
+            stop_on_breach=stop_on_breach,
+            sharpness=sharpness,
+            stats=stats,
+            time_limit=time_cap or None
+        )
+    except SolverTimeout:
+        t, data_sol, crossings = DEFAULT_MODEL.integrate_fixed(
+            init_eq, t_grid, factors, equations, levels, stop_on_breach=stop_on_breach)
+        if stats is not None:
+            stats.update(fallback='rk4', time_cap=time_cap)
+    
+    return t, normalize_trajectory(data_sol), crossings
 
+def compare_saturation(initial_equations, factors, equations, restrictions, sharpness=50):
+    """Сравнение жёсткого и гладкого ограничения: шаги, вычисления правой части, расхождение"""
+    hard, smooth = {}, {}
+    _, data_hard, _ = simulate(initial_equations, factors, equations, restrictions, stats=hard)
+    _, data_smooth, _ = simulate(initial_equations, factors, equations, restrictions,
+                                 sharpness=sharpness, stats=smooth)
+    return {
+        'clip': hard,
+        'smooth': dict(smooth, sharpness=sharpness),
+        'max_difference': float(np.max(np.abs(data_hard - data_smooth))),
+    }
+
+def render_images(t, data_sol, initial_equations, factors, restrictions, crossings=None,
+                  profile='full', fmt='png'):
+    """Графики и диаграммы готового решения в base64 (ключи figure1, figure2, diagram1..diagram5)"""
+    stopped_early = t[-1] < 1.0
+    with memory.stage('graphics'):
+        figure_b64 = create_graphics(t, data_sol, factors, crossings, profile, fmt)
     
-    if np.any(data_sol < 0) or np.any(data_sol > 1):
-        data_sol = gentle_normalize(data_sol)
-    else:
-        data_sol = np.clip(data_sol, 0.0, 1.0)
-    
-    figure_b64 = create_graphics(t, data_sol, factors)
+    with memory.stage('radar'):
+        radar_imgs = draw_radar_series(data_sol, initial_equations[:8], restrictions[:8],
+                                       t if stopped_early else None, profile=profile, fmt=fmt)
     
-    radar_imgs = draw_radar_series(data_sol, initial_equations[:8], restrictions[:8])
+    return {
+        'figure1': figure_b64[0],
+        'figure2': figure_b64[1],
+        'diagram1': radar_imgs[0],
+        'diagram2': radar_imgs[1],
+        'diagram3': radar_imgs[2],
+        'diagram4': radar_imgs[3],
+        'diagram5': radar_imgs[4],
+    }
+
+def run_simulation(initial_equations, factors, equations, restrictions,
+                   thresholds=None, stop_on_breach=False, sharpness=None, profile='full', fmt='png'):
+    """Расчёт и изображения в base64; profile='trajectory' — только траектория, без изображений"""
+    solver_stats = {'mode': 'clip' if sharpness is None else 'smooth', 'sharpness': sharpness}
+    with memory.stage('simulate'):
+        t, data_sol, crossings = simulate(initial_equations, factors, equations, restrictions,
+                                          thresholds, stop_on_breach,
+                                          sharpness=sharpness, stats=solver_stats,
+                                          time_cap=SOLVER_TIME_CAP)
+    stopped_early = t[-1] < 1.0
+    
+    if profile == 'trajectory':
+        return {
+            'profile': profile,
+            'format': None,
+            'image_bytes': {},
+            'solver': solver_stats,
+            'crossings': crossings,
+            'stopped_at': float(t[-1]) if stopped_early else None,
+            't': t.round(6).tolist(),
+            'trajectory': data_sol.round(6).tolist(),
+            'images_b64': {},
+        }
+    
+    images_b64 = render_images(t, data_sol, initial_equations, factors, restrictions, crossings,
+                               profile, fmt)
     
     return {
-        'images_b64': {
-            'figure1': figure_b64[0],
-            'figure2': figure_b64[1],
-            'diagram1': radar_imgs[0],
-            'diagram2': radar_imgs[1],
-            'diagram3': radar_imgs[2],
-            'diagram4': radar_imgs[3],
-            'diagram5': radar_imgs[4],
-        },
+        'profile': profile if isinstance(profile, str) else 'custom',
+        'format': fmt,
+        'image_bytes': image_sizes(images_b64),
+        'solver': solver_stats,
+        'crossings': crossings,
+        'stopped_at': float(t[-1]) if stopped_early else None,
+        'images_b64': images_b64,
     }
 
+# Одинаковые одновременные запросы (например, значения по умолчанию на занятии)
+# ждут одного расчёта вместо того, чтобы запускать свой
+COALESCE_TIMEOUT = float(os.environ.get('COALESCE_TIMEOUT', 120))
+_simulations = SingleFlight()
+
+def simulation_key(initial_equations, factors, equations, restrictions, **options):
+    """Хэш нормализованных параметров расчёта (числа округляются до 6 знаков)"""
+    def norm(values):
+        return [norm(v) if isinstance(v, (list, tuple, np.ndarray)) else round(float(v), 6) for v in values]
+    payload = json.dumps([norm(initial_equations[:8]), norm(factors), norm(equations),
+                          norm(restrictions[:8]), options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def run_simulation_shared(initial_equations, factors, equations, restrictions, timeout=None, **options):
+    """run_simulation, объединённый с уже идущим расчётом тех же параметров.
+
+    Возвращает (outputs, shared): shared=True, если результат получен от
+    другого запроса. Результат общий для всех ожидавших, изменять его нельзя.
+    """
+    key = simulation_key(initial_equations, factors, equations, restrictions, **options)
+    return _simulations.do(
+        key,
+        lambda: run_simulation(initial_equations, factors, equations, restrictions, **options),
+        COALESCE_TIMEOUT if timeout is None else timeout)
+
+def simulation_in_flight(initial_equations, factors, equations, restrictions, **options):
+    """Идёт ли уже расчёт с такими параметрами (к нему можно присоединиться без нового)"""
+    key = simulation_key(initial_equations, factors, equations, restrictions, **options)
+    return _simulations.running(key)
+
+def coalescing_stats():
+    running, waiting = _simulations.in_flight()
+    return dict(_simulations.stats, running=running, waiting=waiting)
+
 def build_default_inputs():
     """Создает фиксированные входные данные (старая версия)"""
     u_values = [0.5, 0.6, 0.4, 0.55, 0.3, 0.35, 0.45, 0.25]
@@ -477,27 +675,18 @@ def build_default_inputs():
     return defaults
 
 def get_u_variable_for_equation(equation_number):
-    mapping = {
-        1: 2,   # f1 зависит от X2
-        2: 3,   # f2 зависит от X3
-        3: 4,   # f3 зависит от X4
-        4: 4,   # f4 зависит от X4
-        5: 6,   # f5 зависит от X6
-        6: 7,   # f6 зависит от X7
-        7: 8,   # f7 зависит от X8
-        8: 7,   # f8 зависит от X7
-        9: 1,   # f9 зависит от X1
-        10: 2,  # f10 зависит от X2
-        11: 7,  # f11 зависит от X7
-        12: 1,  # f12 зависит от X1
-        13: 2,  # f13 зависит от X2
-        14: 2,  # f14 зависит от X2
-        15: 2,  # f15 зависит от X2
-        16: 3,  # f16 зависит от X3
-        17: 4,  # f17 зависит от X4
-        18: 2   # f18 зависит от X2
-    }
-    return mapping.get(equation_number, "?")
+    """Номер характеристики, от которой зависит функция f{equation_number}"""
+    transfers = DEFAULT_SPEC['transfers']
+    if not 1 <= equation_number <= len(transfers):
+        return "?"
+    return DEFAULT_MODEL.variables.index(transfers[equation_number - 1]['argument']) + 1
+
+# Допустимые диапазоны полей формы (parse_form ограничивает значения ими)
+U_BOUNDS = (0.1, 0.9)
+FAK_A_BOUNDS = (0.0, 1.0)
+FAK_B_BOUNDS = (-0.5, 0.5)
+EQ_K_BOUNDS = (-0.8, 0.8)
+EQ_B_BOUNDS = (0.1, 0.9)
 
 def parse_form(form):
     u = []
@@ -508,7 +697,7 @@ def parse_form(form):
         value = form.get(field_name, '0.5')
         try:
             val = float(value or 0.5)
-            val = max(0.1, min(0.9, val))
+            val = max(U_BOUNDS[0], min(U_BOUNDS[1], val))
             u.append(val)
         except ValueError:
             u.append(0.5)
@@ -540,8 +729,8 @@ def parse_form(form):
         except ValueError:
             b = 0.0
         
-        a = max(0.0, min(1.0, a))
-        b = max(-0.5, min(0.5, b)) 
+        a = max(FAK_A_BOUNDS[0], min(FAK_A_BOUNDS[1], a))
+        b = max(FAK_B_BOUNDS[0], min(FAK_B_BOUNDS[1], b))
         
         factors.append([a, b])
     
@@ -563,9 +752,54 @@ def parse_form(form):
         except ValueError:
             b = 0.5
         
-        k = max(-0.8, min(0.8, k))
-        b = max(0.1, min(0.9, b))  
+        k = max(EQ_K_BOUNDS[0], min(EQ_K_BOUNDS[1], k))
+        b = max(EQ_B_BOUNDS[0], min(EQ_B_BOUNDS[1], b))
         
         equations.append([k, b])
     
-    return u[:8], factors[:5], equations[:18], u_restrictions[:8]
\ No newline at end of file
+    return u[:8], factors[:5], equations[:18], u_restrictions[:8]
+
+# ===============================
+# КЭШ СЦЕНАРИЯ ПО УМОЛЧАНИЮ
+# ===============================
+
+def _source_version():
+    """Хэш исходников, от которых зависит результат расчёта"""
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in ('functions.py', 'model_spec.py', 'web_core.py', 'radar_diagram.py',
+                 'image_formats.py', 'utils.py'):
+        with open(os.path.join(base_dir, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+_SOURCE_VERSION = _source_version()
+_default_cache = {}
+memory.register_cache('default_scenario', lambda: len(_default_cache), _default_cache.clear)
+
+def default_scenario_key():
+    """Ключ сценария по умолчанию: версия кода + входные данные + спецификация модели"""
+    payload = json.dumps([build_default_inputs(), DEFAULT_SPEC], sort_keys=True)
+    return hashlib.sha256((_SOURCE_VERSION + payload).encode('utf-8')).hexdigest()[:16]
+
+def get_default_outputs(guard=nullcontext):
+    """Результат для сценария по умолчанию; считается один раз на версию кода и входных данных.
+
+    guard() — контекст, внутри которого идёт расчёт, если результата нет в кэше.
+    """
+    key = default_scenario_key()
+    outputs = _default_cache.get(key)
+    if outputs is None:
+        defaults = build_default_inputs()
+        with guard():
+            outputs, _ = run_simulation_shared(
+                defaults['u'],
+                defaults['faks'],
+                defaults['equations'],
+                defaults['u_restrictions']
+            )
+        # Результат запасного решателя (см. SOLVER_TIME_CAP) не запоминается
+        if not outputs['solver'].get('fallback'):
+            _default_cache.clear()
+            _default_cache[key] = outputs
+    return key, outputs